@@ -0,0 +1,109 @@
+# Regular import
+import os
+import json
+import time
+import multiprocessing
+
+# Utils
+from app.process import build_csp
+from app.utils.config_loader import ConfigLoader
+from app.cache import SolutionCache
+from core.budget import Budget
+
+# Classes used to build the CSP and solution cache, loaded once in each worker process
+worker_builders = None
+worker_cache = None
+
+
+def init_worker(builders, cache_path=None):
+    """
+    Keeps the classes used to build the CSP in the worker process, so they are sent and loaded once per worker
+    - builders: The classes given to build_csp (constraints, game, csp, heuristics and methods)
+    - cache_path: Path of the solution cache shared by the workers, None to solve every puzzle
+    """
+    global worker_builders, worker_cache
+    worker_builders = builders
+    worker_cache = SolutionCache(cache_path) if cache_path is not None else None
+
+
+def solve_puzzle(task):
+    """
+    Solves one puzzle of the corpus in a worker process
+    - task: (puzzle id, puzzle loaded by ConfigLoader, timeout in seconds or None, engine, count limit or None)
+
+    Returns a dictionnary with the id, the status ("solved", "unsolvable", "timeout" or "error"), the solution (one string per row) and the metrics.
+    With a count limit, the solutions are also counted up to the limit ("solutions" field, 1 means the solution is unique when the limit is 2)
+    """
+    puzzle_id, config_file, timeout, engine, count_limit = task
+    result = {"id": puzzle_id, "status": None, "solution": None, "metrics": None}
+    start_time = time.time()
+    # The cache only knows one solution, it can't be used to count them
+    if worker_cache is not None and count_limit is None:
+        grid = worker_cache.get(config_file)
+        if grid is not None:
+            result.update(status="solved", cached=True, solution=["".join(row) for row in grid], metrics={"time": time.time() - start_time})
+            return result
+    csp = None
+    # The timeout is the time budget of the search, it is checked at each node
+    budget = Budget(time=timeout) if timeout is not None else None
+    try:
+        csp = build_csp(config_file, engine=engine, **worker_builders)
+        if count_limit is None:
+            solution = csp.solve(budget=budget)
+        else:
+            solution, result["solutions"] = None, 0
+            for found in csp.iter_solutions(budget):
+                solution = solution or found
+                result["solutions"] += 1
+                if result["solutions"] >= count_limit:
+                    break
+        if csp.status == "unknown":
+            # With a count limit, the solutions found before the timeout are still given
+            result["status"] = "timeout"
+            if solution is not None:
+                result["solution"] = ["".join(row) for row in csp.format_solution(solution)]
+        elif solution is None:
+            result["status"] = "unsolvable"
+        else:
+            result["status"] = "solved"
+            grid = csp.format_solution(solution)
+            result["solution"] = ["".join(row) for row in grid]
+            if worker_cache is not None:
+                worker_cache.put(config_file, grid)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    if csp is not None:
+        result["metrics"] = csp.performance
+    if result["metrics"] is None or result["metrics"]["time"] is None:
+        result["metrics"] = dict(result["metrics"] or {}, time=time.time() - start_time)
+    return result
+
+
+def solve_batch(corpus_path, output, builders, engine="csp", workers=None, chunksize=8, timeout=None, ordered=True, cache_path=None, count_limit=None):
+    """
+    Solves every puzzle of a corpus in parallel and writes each result as a JSON line as soon as it is available
+    - corpus_path: Directory of .txt input files, .jsonl file or .corpus file (see ConfigLoader.get_corpus)
+    - output: Text stream where the results are written (one JSON object per line)
+    - builders: The classes given to build_csp (constraints, game, csp, heuristics and methods)
+    - engine: "csp", "bitboard", "placement" or "sat"
+    - workers: Number of processes, the number of cores by default
+    - chunksize: Number of puzzles sent to a worker at once
+    - timeout: Maximum time in seconds for each puzzle, None for no limit
+    - ordered: True to write the results in the order of the corpus, False to write them as soon as they are solved
+    - cache_path: Path of a solution cache (see SolutionCache), None to solve every puzzle
+    - count_limit: Number of solutions to look for in each puzzle (2 checks that the solution is unique), None to stop at the first one
+
+    Returns the number of puzzles for each status
+    """
+    tasks = ((puzzle_id, config_file, timeout, engine, count_limit) for puzzle_id, config_file in ConfigLoader.get_corpus(corpus_path))
+    summary = {}
+    with multiprocessing.Pool(workers or os.cpu_count(), initializer=init_worker, initargs=(builders, cache_path)) as pool:
+        results = pool.imap(solve_puzzle, tasks, chunksize) if ordered else pool.imap_unordered(solve_puzzle, tasks, chunksize)
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+            if result.get("cached"):
+                summary["cached"] = summary.get("cached", 0) + 1
+    return summary
@@ -0,0 +1,192 @@
+# Regular import
+import json
+import time
+import random
+import itertools
+import numpy as np
+
+# Utils
+from app.process import build_csp
+from core.budget import Budget
+from app.utils.utils import format_solution
+
+# Metrics recorded for each run, and compared with the baseline
+metrics = ["time", "node_expansions", "number_of_backtracks", "number_of_constraint_checks"]
+
+
+def generate_puzzle(rows, cols, boats, hint_density, seed, max_tries=1000):
+    """
+    Generates a valid puzzle by placing a random fleet on an empty board, the same seed always gives the same puzzle
+    - rows: Rows number of the board
+    - cols: Cols number of the board
+    - boats: Number of boats for each size (like in the input files, [3, 2, 1] is 3 boats of size 1, 2 of size 2 and 1 of size 3)
+    - hint_density: Probability for each boat cell to be given as a hint
+    - seed: Seed of the random generator
+    - max_tries: Number of placements tried for each boat before starting again from an empty board
+
+    Returns the puzzle with the same format as ConfigLoader.get_config, and its solution as a np.array of signs
+    """
+    rng = random.Random(seed)
+    fleet = [size for size, nb in enumerate(boats, 1) for _ in range(nb)]
+    for _ in range(max_tries):
+        board = np.zeros((rows, cols), dtype=int)
+        # The biggest boats are placed first, they are the hardest to fit
+        for size in sorted(fleet, reverse=True):
+            for _ in range(max_tries):
+                horizontal = rng.random() < 0.5
+                x = rng.randrange(rows if horizontal else rows - size + 1)
+                y = rng.randrange(cols - size + 1 if horizontal else cols)
+                cells = [(x, y + i) if horizontal else (x + i, y) for i in range(size)]
+                # A boat can't touch another one, even by a corner
+                if not board[max(x - 1, 0):cells[-1][0] + 2, max(y - 1, 0):cells[-1][1] + 2].any():
+                    for cell in cells:
+                        board[cell] = size
+                    break
+            else:
+                break
+        else:
+            solution = format_solution({(x, y): int(board[x, y]) for x in range(rows) for y in range(cols)})
+            hints = np.array([
+                [sign if sign != "." and rng.random() < hint_density else "0" for sign in line] for line in solution
+            ])
+            puzzle = {
+                "rows": (board > 0).sum(axis=1),
+                "cols": (board > 0).sum(axis=0),
+                "boats": np.array(boats),
+                "board": hints,
+            }
+            return puzzle, solution
+    raise ValueError(f"The fleet {boats} doesn't fit on a {rows}x{cols} board")
+
+
+def generate_corpus(sizes, boats, hint_density, seeds):
+    """
+    Generates the puzzles of a benchmark
+    - sizes: Board sizes (a square board is generated for each size)
+    - boats: Number of boats for each size
+    - hint_density: Probability for each boat cell to be given as a hint
+    - seeds: Seeds of the puzzles generated for each board size
+
+    Returns a list of (puzzle id, puzzle) pairs
+    """
+    return [
+        (f"{size}x{size}-{seed}", generate_puzzle(size, size, boats, hint_density, seed)[0])
+        for size in sizes for seed in seeds
+    ]
+
+
+def strategy_matrix(MRV, MaxDegree, LCV, AC3, ForwardCheck):
+    """
+    Builds every combination of heuristics and methods to compare
+    - MRV, MaxDegree: Variable heuristics, used alone, together or not at all
+    - LCV: Value heuristic, used or not
+    - AC3, ForwardCheck: Methods, used alone, together or not at all
+
+    Returns a list of (name, heuristics, methods)
+    """
+    def subsets(items):
+        return [list(c) for k in range(len(items) + 1) for c in itertools.combinations(items, k)]
+
+    matrix = []
+    for variable, value, methods in itertools.product(subsets([MRV, MaxDegree]), subsets([LCV]), subsets([AC3, ForwardCheck])):
+        heuristics = variable + value
+        name = "+".join(c.__name__ for c in heuristics + methods) or "none"
+        matrix.append((name, heuristics, methods))
+    return matrix
+
+
+def run_strategy(config_file, builders, heuristics, methods, engine="csp", timeout=None):
+    """
+    Solves a puzzle with a combination of heuristics and methods
+    - config_file: The puzzle loaded by ConfigLoader
+    - builders: The classes given to build_csp (constraints, game, csp, heuristics and methods)
+    - heuristics: Heuristics used by the CSP
+    - methods: Methods used by the CSP
+    - timeout: Maximum time in seconds, None for no limit
+
+    Returns a dictionnary with the status ("solved", "unsolvable" or "timeout") and the metrics
+    """
+    csp = build_csp(config_file, engine=engine, **builders)
+    csp.reset_all
+    csp.add_heuristics(heuristics)
+    csp.add_methods(methods)
+    start_time = time.time()
+    csp.solve(budget=Budget(time=timeout) if timeout is not None else None)
+    result = {"status": "timeout" if csp.status == "unknown" else csp.status}
+    result.update(csp.performance)
+    if result["time"] is None:
+        result["time"] = time.time() - start_time
+    return result
+
+
+def run_benchmark(corpus, builders, matrix, engine="csp", repeat=1, timeout=None, verbose=False):
+    """
+    Runs every combination of the matrix on every puzzle of the corpus
+    - corpus: List of (puzzle id, puzzle) pairs
+    - builders: The classes given to build_csp (constraints, game, csp, heuristics and methods)
+    - matrix: List of (name, heuristics, methods), see strategy_matrix
+    - repeat: Number of runs of each combination, the fastest time is kept
+    - timeout: Maximum time in seconds for each run, None for no limit
+    - verbose: True to print each result
+
+    Returns a list of results, one dictionnary per (puzzle, combination) with the status and the metrics
+    """
+    results = []
+    for puzzle_id, config_file in corpus:
+        for name, heuristics, methods in matrix:
+            runs = [run_strategy(config_file, builders, heuristics, methods, engine, timeout) for _ in range(repeat)]
+            result = dict(min(runs, key=lambda run: run["time"]), puzzle=puzzle_id, strategy=name)
+            results.append(result)
+            if verbose:
+                print("{:<12} {:<36} {:<10} {:.4f}s {} nodes".format(
+                    puzzle_id, name, result["status"], result["time"], result["node_expansions"]))
+    return results
+
+
+def compare(results, baseline, threshold=0.2, min_time=0.01):
+    """
+    Compares the results of a benchmark with a baseline
+    - results: Results of run_benchmark
+    - baseline: Results of a previous run_benchmark on the same corpus
+    - threshold: Relative increase above which a metric is flagged (0.2 is 20% more than the baseline)
+    - min_time: Times below this value (in seconds) are too noisy to be compared
+
+    Returns a list of regressions: dictionnaries with the puzzle, the strategy, the metric, the baseline and the new value
+    """
+    reference = {(r["puzzle"], r["strategy"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        base = reference.get((result["puzzle"], result["strategy"]))
+        if base is None:
+            continue
+        # A run that was solved in the baseline and isn't anymore is always a regression
+        if base["status"] == "solved" and result["status"] != "solved":
+            regressions.append({"puzzle": result["puzzle"], "strategy": result["strategy"], "metric": "status",
+                                "baseline": base["status"], "value": result["status"]})
+            continue
+        for metric in metrics:
+            if metric == "time" and max(base[metric], result[metric]) < min_time:
+                continue
+            if result[metric] > base[metric] * (1 + threshold):
+                regressions.append({"puzzle": result["puzzle"], "strategy": result["strategy"], "metric": metric,
+                                    "baseline": base[metric], "value": result[metric]})
+    return regressions
+
+
+def save_results(path, results, parameters):
+    """
+    Writes the results of a benchmark in a JSON file
+    - results: Results of run_benchmark
+    - parameters: Parameters used to generate the corpus, so the benchmark can be reproduced
+    """
+    with open(path, "w") as f:
+        json.dump({"parameters": parameters, "results": results}, f, indent=1)
+
+
+def load_results(path):
+    """
+    Returns the parameters and the results of a benchmark saved with save_results
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+    return data["parameters"], data["results"]
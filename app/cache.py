@@ -0,0 +1,188 @@
+# Regular import
+import time
+import sqlite3
+import hashlib
+import numpy as np
+
+# Signs that change when the board is transposed or flipped
+TRANSPOSE_SIGNS = {"<": "^", "^": "<", ">": "v", "v": ">"}
+FLIP_ROWS_SIGNS = {"^": "v", "v": "^"}
+FLIP_COLS_SIGNS = {"<": ">", ">": "<"}
+
+# The 8 symmetries of a grid: (transpose, flip rows, flip cols), applied in this order
+SYMMETRIES = [(t, r, c) for t in (False, True) for r in (False, True) for c in (False, True)]
+
+
+def remap(grid, signs):
+    """
+    Replaces the signs of a grid
+    - grid: np.array of signs
+    - signs: dictionnary {old sign: new sign}, the other signs are kept
+    """
+    return np.vectorize(lambda sign: signs.get(sign, sign), otypes=[grid.dtype])(grid) if grid.size else grid
+
+
+def transform_grid(grid, symmetry, inverse=False):
+    """
+    Applies a symmetry to a grid of signs (board or solution), the direction signs are remapped to match
+    - grid: np.array of signs
+    - symmetry: (transpose, flip rows, flip cols)
+    - inverse: True to apply the inverse symmetry
+
+    Returns the transformed grid
+    """
+    transpose, flip_rows, flip_cols = symmetry
+    steps = [("t", transpose), ("r", flip_rows), ("c", flip_cols)]
+    for step, active in (reversed(steps) if inverse else steps):
+        if not active:
+            continue
+        if step == "t":
+            grid = remap(grid.T, TRANSPOSE_SIGNS)
+        elif step == "r":
+            grid = remap(grid[::-1, :], FLIP_ROWS_SIGNS)
+        else:
+            grid = remap(grid[:, ::-1], FLIP_COLS_SIGNS)
+    return grid
+
+
+def transform_puzzle(config_file, symmetry):
+    """
+    Applies a symmetry to a puzzle
+    - config_file: The puzzle loaded by ConfigLoader
+    - symmetry: (transpose, flip rows, flip cols)
+
+    Returns (rows, cols, boats, board) of the transformed puzzle
+    """
+    transpose, flip_rows, flip_cols = symmetry
+    rows, cols = list(config_file["rows"]), list(config_file["cols"])
+    if transpose:
+        rows, cols = cols, rows
+    if flip_rows:
+        rows = rows[::-1]
+    if flip_cols:
+        cols = cols[::-1]
+    return rows, cols, list(config_file["boats"]), transform_grid(config_file["board"], symmetry)
+
+
+def canonical_form(config_file):
+    """
+    Finds the canonical form of a puzzle: the smallest serialization among its 8 symmetries,
+    so a puzzle, its mirror images and its transposes share the same form
+
+    Returns the canonical form as a string and the symmetry that gives it
+    """
+    forms = []
+    for symmetry in SYMMETRIES:
+        rows, cols, boats, board = transform_puzzle(config_file, symmetry)
+        form = "|".join([
+            ",".join(str(int(x)) for x in rows),
+            ",".join(str(int(x)) for x in cols),
+            ",".join(str(int(x)) for x in boats),
+            "/".join("".join(line) for line in board),
+        ])
+        forms.append((form, symmetry))
+    return min(forms)
+
+
+class SolutionCache:
+    """This class stores the solutions already found in a SQLite database, so a puzzle that has been solved once
+    (or any of its mirror images and transposes) doesn't have to be solved again.
+    The solutions are stored in the canonical orientation of the puzzle and transformed back to the orientation of the caller.
+    When the cache is full, the least recently used solutions are evicted.
+    """
+
+    def __init__(self, path, max_entries=1_000_000, eviction_check=1000):
+        """
+        - path: Path of the SQLite database (created if it doesn't exist)
+        - max_entries: Maximum number of solutions kept
+        - eviction_check: The size of the cache is checked every eviction_check insertions
+        """
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, solution TEXT NOT NULL, last_used REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)")
+        self.connection.commit()
+        self.max_entries = max_entries
+        self.eviction_check = eviction_check
+        self.insertions = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    @staticmethod
+    def key(config_file):
+        """
+        Returns the key of a puzzle (hash of its canonical form) and the symmetry that gives its canonical form
+        - config_file: The puzzle loaded by ConfigLoader
+        """
+        form, symmetry = canonical_form(config_file)
+        return hashlib.sha256(form.encode()).hexdigest(), symmetry
+
+
+    def get(self, config_file):
+        """
+        Looks for the solution of a puzzle
+        - config_file: The puzzle loaded by ConfigLoader
+
+        Returns the solution as a np.array of signs in the orientation of the puzzle, or None if it is not in the cache
+        """
+        key, symmetry = self.key(config_file)
+        row = self.connection.execute("SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute("UPDATE solutions SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        canonical = np.array([[sign for sign in line] for line in row[0].split("\n")])
+        return transform_grid(canonical, symmetry, inverse=True)
+
+
+    def put(self, config_file, solution):
+        """
+        Stores the solution of a puzzle
+        - config_file: The puzzle loaded by ConfigLoader
+        - solution: The solution as a np.array of signs (see format_solution)
+        """
+        key, symmetry = self.key(config_file)
+        canonical = transform_grid(np.asarray(solution), symmetry)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO solutions (key, solution, last_used) VALUES (?, ?, ?)",
+            (key, "\n".join("".join(line) for line in canonical), time.time()),
+        )
+        self.connection.commit()
+        self.insertions += 1
+        if self.insertions % self.eviction_check == 0:
+            self.evict()
+
+
+    def evict(self):
+        """
+        Removes the least recently used solutions when there are more than max_entries
+        """
+        size = self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        if size > self.max_entries:
+            excess = size - self.max_entries
+            self.connection.execute(
+                "DELETE FROM solutions WHERE key IN (SELECT key FROM solutions ORDER BY last_used LIMIT ?)", (excess,)
+            )
+            self.connection.commit()
+            self.evictions += excess
+
+
+    @property
+    def stats(self):
+        """
+        Returns the counters of the cache: hits, misses, hit rate and evictions
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+    def close(self):
+        self.connection.close()
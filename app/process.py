@@ -1,9 +1,14 @@
 # Regular import
+import os
 import numpy as np
 
 # Utils
-from app.utils.utils import get_adjacent_cell, get_surrounding_cells, format_solution
+from app.utils.utils import get_adjacent_cell, get_surrounding_cells, format_solution, save_grid, display_grid
 from app.utils.config_loader import ConfigLoader
+from app.cache import SolutionCache
+from core.network import ConstraintNetwork
+from core.profiler import Profiler
+from core.check_cache import CheckCache
 
 def main(
     config_path,
@@ -18,10 +23,116 @@ def main(
     MaxDegree,
     AC3,
     ForwardCheck,
+    MAC=None,
+    BitboardCSP=None,
+    PlacementCSP=None,
+    SatCSP=None,
+    engine="csp",
+    network_path=None,
+    cache_path=None,
+    workers=None,
+    profile_path=None,
+    trace_path=None,
+    search_trace_path=None,
+    check_cache_size=None,
 ):
 
 
     config_file = ConfigLoader.get_config(config_path)
+
+    # A puzzle already solved (or one of its mirror images and transposes) is read from the cache
+    cache = SolutionCache(cache_path) if cache_path is not None else None
+    if cache is not None:
+        grid = cache.get(config_file)
+        if grid is not None:
+            save_grid(grid, output_path)
+            display_grid(grid)
+            print("Solution found in cache {}".format(cache.stats))
+            cache.close()
+            return
+
+    csp = build_csp(
+        config_file,
+        m_constraint_builder=m_constraint_builder,
+        border_constraint_builder=border_constraint_builder,
+        game_builder=game_builder,
+        csp_builder=csp_builder,
+        global_constraints=global_constraints,
+        MRV=MRV,
+        LCV=LCV,
+        MaxDegree=MaxDegree,
+        AC3=AC3,
+        ForwardCheck=ForwardCheck,
+        MAC=MAC,
+        BitboardCSP=BitboardCSP,
+        PlacementCSP=PlacementCSP,
+        SatCSP=SatCSP,
+        engine=engine,
+        network_path=network_path,
+    )
+
+    # Results of the local constraint checks kept in a LRU cache of check_cache_size entries (csp engine, None to check every time)
+    check_cache = None
+    if check_cache_size:
+        check_cache = CheckCache(check_cache_size)
+        check_cache.attach(csp)
+
+    # Time spent in each constraint, method and heuristic, written as JSON and as a Chrome trace (csp engine, in this process only)
+    profiler = None
+    if profile_path is not None or trace_path is not None:
+        profiler = Profiler()
+        profiler.attach(csp)
+
+    #Solve the solution with backtracking using all the strategies defined above (split between several processes if workers > 1)
+    #Every decision, pruning, failure and backtrack is logged in search_trace_path when it is given (see core.trace, csp engine only)
+    csp.solve(workers, trace_path=search_trace_path)
+
+    if profiler is not None:
+        profiler.detach(csp)
+        if profile_path is not None:
+            profiler.save_json(profile_path)
+        if trace_path is not None:
+            profiler.save_chrome_trace(trace_path)
+
+    csp.save_solution(output_path)
+    csp.display_solution()
+    csp.display_performance()
+    if check_cache is not None:
+        print("Constraint check cache {}".format(check_cache.stats))
+    if cache is not None:
+        cache.put(config_file, csp.format_solution(csp.solution))
+        cache.close()
+
+
+def build_csp(
+    config_file,
+    m_constraint_builder,
+    border_constraint_builder,
+    game_builder,
+    csp_builder,
+    global_constraints,
+    MRV,
+    LCV,
+    MaxDegree,
+    AC3,
+    ForwardCheck,
+    MAC=None,
+    BitboardCSP=None,
+    PlacementCSP=None,
+    SatCSP=None,
+    engine="csp",
+    network_path=None,
+):
+    """
+    Builds the CSP of a loaded puzzle (variables, domains, constraints, heuristics and methods), ready to be solved
+    - config_file: The puzzle loaded by ConfigLoader ("rows", "cols", "boats" and "board")
+    - engine: "csp", "bitboard", "placement" or "sat"
+    - network_path: Optional .npz file of the constraint network for this board shape (loaded if it exists, saved otherwise)
+    The other parameters are the classes used to build the CSP.
+
+    Returns the CSP
+    """
+    config_file = dict(config_file)
     rows, cols = config_file["board"].shape
 
     # Variables, we consider every case of the board
@@ -39,16 +150,28 @@ def main(
         # If there is a M at this pos, the cell can't take the value 0, 1 and 2 beause it's the middle of a boat
         if game.board[x, y] != "0":  # To avoid testing each sign every time because most of the time valur will be 0
             if game.board[x, y] == "M":
-                for i in range(3):
-                    domains[(x, y)].remove(i)
+                domains[(x, y)] = [i for i in domains[(x, y)] if i > 2]
+                # On the border of the board, the boat can only go along the border
+                on_row_edge, on_col_edge = x in (0, rows - 1), y in (0, cols - 1)
+                if on_row_edge and on_col_edge:
+                    raise ValueError("There is no possible solution for this input file")
+                if on_row_edge or on_col_edge:
+                    along = [(x, y - 1), (x, y + 1)] if on_row_edge else [(x - 1, y), (x + 1, y)]
+                    inward = (x + 1 if x == 0 else x - 1, y) if on_row_edge else (x, y + 1 if y == 0 else y - 1)
+                    for cell in along:
+                        domains[cell] = [i for i in domains[cell] if i > 2]
+                    domains[inward] = [i for i in domains[inward] if i == 0]
             # If there is any of this sign ["<", ">", "^", "v"] at this pos, the cell can't take the value 0 and 1 because it's a boat extermity
             elif game.board[x, y] in ["<", ">", "^", "v"]:
                 # Also remove values from the adjacent cell depending on sign orientation
                 cell = get_adjacent_cell((x, y), game.board[x, y], rows, cols)
                 if(cell):
-                    for i in range(2):
-                        domains[(x, y)].remove(i)
-                        domains[cell].remove(i)
+                    domains[(x, y)] = [i for i in domains[(x, y)] if i > 1]
+                    domains[cell] = [i for i in domains[cell] if i > 1]
+                    # The cell behind a boat extremity is water
+                    behind = get_adjacent_cell((x, y), {"<": ">", ">": "<", "^": "v", "v": "^"}[game.board[x, y]], rows, cols)
+                    if behind:
+                        domains[behind] = [i for i in domains[behind] if i == 0]
                 else:
                     raise ValueError("There is no possible solution for this input file")
             elif game.board[x, y] == "S":
@@ -73,12 +196,22 @@ def main(
                 if 0 <= i < rows and 0 <= j < cols:
                     constraints[variable].append(border_constraint_builder((i, j)))
         if game.board[x, y] != "0":
-            if game.board[x, y] == "M":
+            # On the border the domains already put the M in a boat along the border (see above), there is nothing left to check
+            if game.board[x, y] == "M" and 0 < x < rows - 1 and 0 < y < cols - 1:
                 cells = get_surrounding_cells((x, y), rows, cols)
                 for current_cell in cells:
                     constraints[current_cell].append(m_constraint_builder([cell for cell in cells if cell != current_cell]))
 
 
+    # Neighbours of each variable, the part that only depends on the board shape can be reused between boards
+    network = None
+    if network_path is not None:
+        if os.path.exists(network_path):
+            network = ConstraintNetwork.load(network_path, game.variables, constraints, game.get_shape)
+        else:
+            network = ConstraintNetwork(game.variables, constraints, game.get_shape)
+            network.save(network_path)
+
     glb_constraints = [
         global_constraints.respect_cardinality,
         global_constraints.check_boat_size,
@@ -87,22 +220,24 @@ def main(
 
 
     # Solve the BattleShip puzzle using CSP
-    csp = csp_builder(game, domains, constraints, glb_constraints, format_solution)
+    # - engine : "csp" (dictionnaries, default), "bitboard" (integer bitmasks, much faster on large boards)
+    #            "placement" (one variable per boat, its domain are the boat placements)
+    #            or "sat" (CNF solved by clause learning, with the bundled solver or the SAT_SOLVER binary)
+    engines = {"csp": csp_builder, "bitboard": BitboardCSP, "placement": PlacementCSP, "sat": SatCSP}
+    if engines.get(engine) is None:
+        raise ValueError(f"Engine {engine} : is not available, chose one of {[e for e, b in engines.items() if b is not None]}")
+    csp = engines[engine](game, domains, constraints, glb_constraints, format_solution, network)
     """
     Chose different strategies that can make algorithm faster
-    - Heuristic : mrv, max_degree
-    - Ordering : lcv
-    - Filter : forward_check, ac3
+    - Heuristic : mrv, max_degree, dom_wdeg (heuristics.variable.DomWdeg, learns from the failures)
+    - Ordering : lcv, support_lcv (heuristics.value.SupportLCV, reads incremental support counts)
+    - Filter : forward_check, ac3, mac (ac3 maintained after each assignment)
+             line (row and column counts, methods.line.LinePropagation)
+    - Search : cbj (conflict-directed backjumping with nogoods, methods.backjumping.Backjumping)
     Example bellow
     """
     heuristics = [MRV, LCV]
     methods = [AC3, ForwardCheck]
     csp.add_heuristics(heuristics)
     csp.add_methods(methods)
-
-    #Solve the solution with backtracking using all the strategies defined above
-    csp.solve()
-
-    csp.save_solution(output_path)
-    csp.display_solution()
-    csp.display_performance()
\ No newline at end of file
+    return csp
\ No newline at end of file
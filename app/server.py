@@ -0,0 +1,403 @@
+# Regular import
+import os
+import json
+import time
+import asyncio
+import itertools
+import collections
+import concurrent.futures
+
+# Utils
+from app.batch import init_worker, solve_puzzle
+from app.utils.config_loader import ConfigLoader
+
+
+def warm_up():
+    """
+    Runs in a worker process when the pool starts, so the process is forked and the modules are loaded before the first request
+    """
+    return os.getpid()
+
+
+class SolverService:
+    """This class is an asyncio server that solves puzzles sent as newline-delimited JSON, over TCP or a Unix socket (and HTTP optionally).
+    The puzzles are solved by a pool of worker processes started and warmed up once (see app.batch.init_worker), so a request
+    doesn't pay for the interpreter startup nor for loading the classes.
+
+    Every request is one JSON object on one line, the response is one JSON line with the same "id" (the responses of a connection
+    can come back in another order than the requests):
+    - {"op": "solve", "puzzle": {...}, "deadline": 5, "engine": "csp", "count": 2}: the puzzle has the format of ConfigLoader.from_dict,
+      the response is the result of app.batch.solve_puzzle with the latency of the request
+    - {"op": "stats"}: queue depth, requests in flight, latency percentiles and number of results of each status
+    - {"op": "ping"}
+
+    The requests wait in a bounded queue: when it is full, the connection is not read until a worker is free (backpressure).
+    The deadline of a request counts from its arrival. The time left when a worker takes it is the time budget of the search,
+    so the search is cancelled at its deadline (a request still in the queue at its deadline is not solved).
+    """
+
+    def __init__(self, builders, workers=None, queue_size=64, engine="csp", deadline=None, cache_path=None, latency_window=1000):
+        """
+        - builders: The classes given to build_csp (constraints, game, csp, heuristics and methods)
+        - workers: Number of processes, the number of cores by default
+        - queue_size: Maximum number of requests waiting for a worker
+        - engine: Engine used when the request doesn't give one
+        - deadline: Deadline in seconds used when the request doesn't give one, None for no limit
+        - cache_path: Path of a solution cache shared by the workers (see SolutionCache), None to solve every puzzle
+        - latency_window: Number of recent latencies kept for the percentiles
+        """
+        self.builders = builders
+        self.workers = workers or os.cpu_count()
+        self.queue_size = queue_size
+        self.engine = engine
+        self.deadline = deadline
+        self.cache_path = cache_path
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.counters = collections.Counter()
+        self.in_flight = 0
+        self.queue = None
+        self.executor = None
+        self.dispatchers = []
+        self.servers = []
+        self.unix_path = None
+        self.ids = itertools.count()
+
+
+    async def start(self, host="127.0.0.1", port=None, unix_path=None, http_port=None):
+        """
+        Starts the worker pool and the servers
+        - host: Address of the TCP and HTTP servers
+        - port: Port of the JSON lines server over TCP, None for no TCP server (0 picks a free port, see addresses)
+        - unix_path: Path of the JSON lines server over a Unix socket, None for no Unix server
+        - http_port: Port of the HTTP server (POST /solve and GET /stats), None for no HTTP server
+        """
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(self.queue_size)
+        self.executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(self.builders, self.cache_path))
+        # Every process is started before the first request
+        await asyncio.gather(*(loop.run_in_executor(self.executor, warm_up) for _ in range(self.workers)))
+        self.dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+        if port is not None:
+            self.servers.append(await asyncio.start_server(self.handle_lines, host, port))
+        if unix_path is not None:
+            self.servers.append(await asyncio.start_unix_server(self.handle_lines, unix_path))
+            self.unix_path = unix_path
+        if http_port is not None:
+            self.servers.append(await asyncio.start_server(self.handle_http, host, http_port))
+
+
+    @property
+    def addresses(self):
+        """
+        Returns the address of every socket served ((host, port) or Unix path)
+        """
+        return [sock.getsockname() for server in self.servers for sock in server.sockets]
+
+
+    async def serve_forever(self):
+        """
+        Serves the requests until the task is cancelled, then stops
+        """
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in self.servers))
+        finally:
+            await self.stop()
+
+
+    async def stop(self):
+        """
+        Closes the servers, stops the dispatchers and the worker processes
+        """
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
+            self.unix_path = None
+        for task in self.dispatchers:
+            task.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.dispatchers = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+
+    async def dispatch(self):
+        """
+        Gives the requests of the queue to the worker processes, one request at a time (there is one dispatcher per worker)
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            request, future = await self.queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                timeout = None
+                if request["deadline"] is not None:
+                    timeout = request["deadline"] - (time.monotonic() - request["arrival"])
+                    if timeout <= 0:
+                        future.set_result({"id": request["id"], "status": "timeout", "solution": None, "metrics": None})
+                        continue
+                task = (request["id"], request["puzzle"], timeout, request["engine"], request["count"])
+                self.in_flight += 1
+                try:
+                    result = await loop.run_in_executor(self.executor, solve_puzzle, task)
+                except Exception as e:
+                    result = {"id": request["id"], "status": "error", "error": str(e), "solution": None, "metrics": None}
+                finally:
+                    self.in_flight -= 1
+                if not future.cancelled():
+                    future.set_result(result)
+            except Exception as e:
+                # A request that can't be dispatched is answered with an error, the dispatcher keeps serving the queue
+                if not future.done():
+                    error = f"{type(e).__name__}: {e}"
+                    future.set_result({"id": request.get("id"), "status": "error", "error": error, "solution": None, "metrics": None})
+            finally:
+                self.queue.task_done()
+
+
+    async def enqueue(self, message):
+        """
+        Queues a request, the wait for a free place in the queue is the backpressure (the other operations are answered at once).
+        A request with a wrong puzzle, deadline (a non-negative number or null) or count (a positive integer or null) is answered "invalid"
+        - message: The decoded request
+
+        Returns an awaitable of the response
+        """
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        if not isinstance(message, dict):
+            self.counters["invalid"] += 1
+            done.set_result({"status": "invalid", "error": "A request must be a JSON object"})
+            return done
+        op = message.get("op", "solve")
+        request_id = message.get("id", next(self.ids))
+        if op == "stats":
+            done.set_result(dict(self.stats, id=request_id, status="ok"))
+            return done
+        if op == "ping":
+            done.set_result({"id": request_id, "status": "ok"})
+            return done
+        if op != "solve":
+            self.counters["invalid"] += 1
+            done.set_result({"id": request_id, "status": "invalid", "error": f"Unknown operation {op}"})
+            return done
+        try:
+            deadline = message.get("deadline", self.deadline)
+            if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float)) or not deadline >= 0):
+                raise ValueError(f"The deadline must be a non-negative number of seconds or null, not {deadline!r}")
+            count = message.get("count")
+            if count is not None and (isinstance(count, bool) or not isinstance(count, int) or count < 1):
+                raise ValueError(f"The count must be a positive integer or null, not {count!r}")
+            request = {
+                "id": request_id,
+                "puzzle": ConfigLoader.from_dict(message["puzzle"]),
+                "deadline": deadline,
+                "engine": message.get("engine", self.engine),
+                "count": count,
+                "arrival": time.monotonic(),
+            }
+        except Exception as e:
+            self.counters["invalid"] += 1
+            done.set_result({"id": request_id, "status": "invalid", "error": f"{type(e).__name__}: {e}"})
+            return done
+        await self.queue.put((request, done))
+        return asyncio.ensure_future(self.result(request, done))
+
+
+    async def result(self, request, future):
+        """
+        Waits for the result of a queued request and records its latency
+
+        Returns the response
+        """
+        result = await future
+        result["latency"] = time.monotonic() - request["arrival"]
+        self.latencies.append(result["latency"])
+        self.counters[result["status"]] += 1
+        return result
+
+
+    async def respond(self, message):
+        """
+        Answers a request of any operation, after waiting for its place in the queue
+
+        Returns the response
+        """
+        return await (await self.enqueue(message))
+
+
+    @property
+    def stats(self):
+        """
+        Returns the state of the service: queue depth, requests in flight, number of results of each status and latency percentiles (seconds)
+        """
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            # Nearest rank
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] if latencies else None
+
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "counters": dict(self.counters),
+            "latency": {"count": len(latencies), "p50": percentile(50), "p90": percentile(90), "p99": percentile(99)},
+        }
+
+
+    async def handle_lines(self, reader, writer):
+        """
+        Serves a JSON lines connection: every line is answered as soon as its result is available
+        """
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def answer(response):
+            response = await response
+            async with lock:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError as e:
+                    message = None
+                    response = asyncio.get_running_loop().create_future()
+                    response.set_result({"status": "invalid", "error": f"Invalid JSON: {e}"})
+                # The next line is only read once this request is queued
+                if message is not None:
+                    response = await self.enqueue(message)
+                task = asyncio.create_task(answer(response))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        except ConnectionError:
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+            writer.close()
+
+
+    async def handle_http(self, reader, writer):
+        """
+        Serves an HTTP/1.1 connection: POST /solve with a JSON request as body, GET /stats, one request per connection
+        """
+        try:
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            if method == "GET" and path == "/stats":
+                code, response = 200, await self.respond({"op": "stats"})
+            elif method == "POST" and path == "/solve":
+                try:
+                    message = json.loads(body)
+                    response = await self.respond(dict(message, op="solve") if isinstance(message, dict) else message)
+                except json.JSONDecodeError as e:
+                    response = {"status": "invalid", "error": f"Invalid JSON: {e}"}
+                code = 400 if response["status"] == "invalid" else 200
+            else:
+                code, response = 404, {"status": "invalid", "error": f"Unknown endpoint {method} {path}"}
+            payload = json.dumps(response).encode()
+            reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}[code]
+            writer.write(f"HTTP/1.1 {code} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode())
+            writer.write(payload)
+            await writer.drain()
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+class SolverClient:
+    """This class is a JSON lines client of SolverService, the requests can be sent concurrently on the same connection"""
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.waiting = {}
+        self.listener = None
+        self.ids = itertools.count()
+
+
+    async def connect(self, host="127.0.0.1", port=None, unix_path=None):
+        """
+        Connects to the TCP server (host and port) or to the Unix socket (unix_path)
+        """
+        if unix_path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.listener = asyncio.create_task(self.listen())
+        return self
+
+
+    async def listen(self):
+        """
+        Reads the responses and gives each one to the request with the same id
+        """
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("The connection to the solver service is closed"))
+
+
+    async def request(self, message):
+        """
+        Sends a request and waits for its response
+        - message: The request (see SolverService), an id is added when it has none
+        """
+        message = dict(message)
+        message.setdefault("id", f"client-{next(self.ids)}")
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[message["id"]] = future
+        self.writer.write((json.dumps(message) + "\n").encode())
+        await self.writer.drain()
+        return await future
+
+
+    async def solve(self, puzzle, **options):
+        """
+        Solves a puzzle (format of ConfigLoader.from_dict), the options are the other fields of the request (deadline, engine, count)
+        """
+        return await self.request(dict(options, op="solve", puzzle=puzzle))
+
+
+    async def stats(self):
+        """
+        Returns the stats of the service
+        """
+        return await self.request({"op": "stats"})
+
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        if self.listener is not None:
+            await self.listener
@@ -1,6 +1,9 @@
 import os
+import json
 import numpy as np
 
+from app.utils.corpus import PuzzleCorpus
+
 
 class ConfigLoader:
     """This class is used to load an input file in the correct format"""
@@ -37,4 +40,58 @@ class ConfigLoader:
                     return _dict
 
         except Exception as e:
-            raise Exception(f"In ConfigLoader {e}")
\ No newline at end of file
+            raise Exception(f"In ConfigLoader {e}")
+
+
+    @staticmethod
+    def from_dict(puzzle):
+        """
+        Load a puzzle given as a dictionnary (for instance a line of a JSONL corpus)
+        - puzzle: dictionnary with "rows", "cols" and "boats" (lists of numbers, or strings of digits like in the .txt files)
+          and "board" (list of strings, one per row)
+
+        Returns a dictionnary with the same format as get_config
+        """
+        _dict = {}
+        for key in ["rows", "cols", "boats"]:
+            _dict[key] = np.array([int(elem) for elem in puzzle[key]])
+        _dict["board"] = np.array([[elem for elem in line] for line in puzzle["board"]])
+        return _dict
+
+
+    @staticmethod
+    def get_corpus(corpus_path):
+        """
+        Load every puzzle of a corpus, one at a time
+        - corpus_path: Directory of .txt input files, .jsonl file with one puzzle per line (see from_dict)
+          or .corpus binary file (see PuzzleCorpus, the puzzles are read from the memory mapped file)
+
+        Yields (puzzle id, puzzle) pairs, the id is the file name or the "id" field of the line (its line number by default)
+        """
+        if os.path.isdir(corpus_path):
+            for name in sorted(os.listdir(corpus_path)):
+                if name.endswith(".txt"):
+                    yield name, ConfigLoader.get_config(os.path.join(corpus_path, name))
+        elif corpus_path.endswith(".jsonl"):
+            with open(corpus_path, "r") as f:
+                for i, line in enumerate(f):
+                    if line.strip():
+                        puzzle = json.loads(line)
+                        yield puzzle.get("id", i), ConfigLoader.from_dict(puzzle)
+        elif corpus_path.endswith(".corpus"):
+            with PuzzleCorpus(corpus_path) as corpus:
+                yield from corpus
+        else:
+            raise Exception(f"In ConfigLoader corpus must be a directory, a .jsonl file or a .corpus file : {corpus_path}")
+
+
+    @staticmethod
+    def convert_corpus(corpus_path, output_path):
+        """
+        Converts a corpus to the binary format read by PuzzleCorpus
+        - corpus_path: Directory of .txt input files or .jsonl file (see get_corpus)
+        - output_path: The .corpus file written
+
+        Returns the number of puzzles converted
+        """
+        return PuzzleCorpus.write(output_path, ConfigLoader.get_corpus(corpus_path))
@@ -0,0 +1,123 @@
+import mmap
+import struct
+import numpy as np
+
+MAGIC = b"BSCORPUS"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")  # Magic, version, unused, number of puzzles and offset of the index
+# One entry per puzzle: offset of its record, number of rows, of cols, of boat sizes and size of its id
+INDEX = np.dtype([("offset", "<u8"), ("rows", "<u2"), ("cols", "<u2"), ("boats", "<u2"), ("id", "<u2")])
+COUNT = np.dtype("<u2")
+MAX_COUNT = np.iinfo(COUNT).max
+ALIGNMENT = 8
+
+
+class PuzzleCorpus:
+    """This class reads a corpus of puzzles stored in one binary file, written with PuzzleCorpus.write.
+    The record of a puzzle is its rows, cols and boats counts (16 bits numbers, so they can have several digits),
+    its board (one byte per cell) and its id. An index at the end of the file gives the offset and the sizes of every record,
+    so the file is memory mapped and a puzzle is decoded from its index without reading the rest of the file.
+    """
+
+    def __init__(self, path):
+        """
+        - path: The corpus file
+        """
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, nb_puzzles, index_offset = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a puzzle corpus")
+        if version != VERSION:
+            raise ValueError(f"{path} has version {version}, only version {VERSION} can be read")
+        self.index = np.frombuffer(self.map, dtype=INDEX, count=nb_puzzles, offset=index_offset)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def __len__(self):
+        return len(self.index)
+
+
+    def __getitem__(self, i):
+        """
+        Returns the puzzle at index i, with the same format as ConfigLoader.get_config
+        """
+        offset, nb_rows, nb_cols, nb_boats, _ = self.index[i].tolist()
+        _dict = {}
+        for key, size in [("rows", nb_rows), ("cols", nb_cols), ("boats", nb_boats)]:
+            _dict[key] = np.frombuffer(self.map, dtype=COUNT, count=size, offset=offset).astype(int)
+            offset += size * COUNT.itemsize
+        board = np.frombuffer(self.map, dtype="S1", count=nb_rows * nb_cols, offset=offset)
+        _dict["board"] = board.astype("U1").reshape(nb_rows, nb_cols)
+        return _dict
+
+
+    def __iter__(self):
+        """
+        Yields every (puzzle id, puzzle) pair in the order of the corpus
+        """
+        for i in range(len(self)):
+            yield self.get_id(i), self[i]
+
+
+    def get_id(self, i):
+        """
+        Returns the id of the puzzle at index i
+        """
+        offset, nb_rows, nb_cols, nb_boats, size = self.index[i].tolist()
+        offset += (nb_rows + nb_cols + nb_boats) * COUNT.itemsize + nb_rows * nb_cols
+        return self.map[offset:offset + size].decode()
+
+
+    def close(self):
+        """
+        Closes the memory map and the file
+        """
+        # The index is a view of the memory map, it has to be released first
+        self.index = None
+        self.map.close()
+        self.file.close()
+
+
+    @staticmethod
+    def write(path, puzzles):
+        """
+        Writes a corpus file, the puzzles are written one at a time and the index at the end
+        - path: The corpus file
+        - puzzles: (puzzle id, puzzle) pairs, puzzles with the same format as ConfigLoader.get_config
+
+        Returns the number of puzzles written, raises a ValueError if a count or a size doesn't fit in 16 bits
+        """
+        index = []
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+            offset = HEADER.size
+            for puzzle_id, puzzle in puzzles:
+                board = np.asarray(puzzle["board"], dtype="U1")
+                counts = [np.asarray(puzzle[key]) for key in ["rows", "cols", "boats"]]
+                if board.shape != (len(counts[0]), len(counts[1])):
+                    raise ValueError(f"The board of {puzzle_id} doesn't match its rows and cols counts")
+                # The counts are 16 bits numbers, astype would wrap the other ones without any error
+                for key, count in zip(["rows", "cols", "boats"], counts):
+                    if count.size and (not np.issubdtype(count.dtype, np.integer) or count.min() < 0 or count.max() > MAX_COUNT):
+                        raise ValueError(f"The {key} counts of {puzzle_id} must be integers from 0 to {MAX_COUNT}")
+                name = str(puzzle_id).encode()
+                if max(len(counts[0]), len(counts[1]), len(counts[2]), len(name)) > MAX_COUNT:
+                    raise ValueError(f"The board, the fleet or the id of {puzzle_id} is too big, their sizes are kept on 16 bits")
+                record = b"".join(count.astype(COUNT).tobytes() for count in counts) + board.astype("S1").tobytes() + name
+                record += bytes(-len(record) % ALIGNMENT)
+                index.append((offset, len(counts[0]), len(counts[1]), len(counts[2]), len(name)))
+                f.write(record)
+                offset += len(record)
+            f.write(np.array(index, dtype=INDEX).tobytes())
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, 0, len(index), offset))
+        return len(index)
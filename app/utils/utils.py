@@ -95,4 +95,23 @@ def format_solution(solution):
                     array_solution[row][col] = "^"
             else :
                 raise ValueError("Boat is supposed to be surrounded only by 1 or 2 boats")
-    return array_solution
\ No newline at end of file
+    return array_solution
+
+
+def save_grid(grid, output_path):
+    """
+    Writes a formatted solution (see format_solution) to a file, one line per row
+    - grid: The solution as a np.array of signs
+    - output_path: path where the file will be saved
+    """
+    with open(output_path, "w") as f:
+        f.write("\n".join("".join(row) for row in grid))
+
+
+def display_grid(grid):
+    """
+    Displays a formatted solution (see format_solution)
+    - grid: The solution as a np.array of signs
+    """
+    for row in grid:
+        print(" ".join(row) + " ")
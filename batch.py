@@ -0,0 +1,65 @@
+# Regular import
+import sys
+import argparse
+
+# Core Objects
+from core.csp import CSP
+from core.game import Game
+from core.bitboard import BitboardCSP
+from core.placement import PlacementCSP
+from core.sat import SatCSP
+
+# Constraints
+from constraints.m_constraint import MConstraint
+from constraints.border_constraint import BorderConstraint
+from constraints.global_constraints import GlobalConstraints
+
+# Heuristics
+from heuristics.value import LCV
+from heuristics.variable import MRV, MaxDegree
+
+# Methods
+from methods.ac3 import AC3, MAC
+from methods.forward_check import ForwardCheck
+
+# Process
+from app.batch import solve_batch
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a corpus of BattleShip puzzles in parallel")
+    parser.add_argument("corpus", help="Directory of .txt input files, .jsonl file with one puzzle per line or .corpus file (see convert.py)")
+    parser.add_argument("--output", help="JSONL file where the results are written (standard output by default)")
+    parser.add_argument("--engine", default="csp", choices=["csp", "bitboard", "placement", "sat"])
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes (number of cores by default)")
+    parser.add_argument("--chunksize", type=int, default=8, help="Number of puzzles sent to a worker at once")
+    parser.add_argument("--timeout", type=float, default=None, help="Maximum time in seconds for each puzzle")
+    parser.add_argument("--unordered", action="store_true", help="Write the results as soon as they are solved")
+    parser.add_argument("--cache", default=None, help="SQLite solution cache, puzzles already solved (or symmetric ones) are not solved again")
+    parser.add_argument("--count", type=int, default=None, help="Count the solutions of each puzzle up to this limit (2 checks uniqueness)")
+    args = parser.parse_args()
+
+    builders = dict(
+        m_constraint_builder = MConstraint,
+        border_constraint_builder = BorderConstraint,
+        game_builder = Game,
+        csp_builder = CSP,
+        global_constraints = GlobalConstraints,
+        MRV = MRV,
+        LCV = LCV,
+        MaxDegree = MaxDegree,
+        AC3 = AC3,
+        ForwardCheck = ForwardCheck,
+        MAC = MAC,
+        BitboardCSP = BitboardCSP,
+        PlacementCSP = PlacementCSP,
+        SatCSP = SatCSP,
+    )
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        summary = solve_batch(args.corpus, output, builders, engine=args.engine, workers=args.workers,
+                              chunksize=args.chunksize, timeout=args.timeout, ordered=not args.unordered,
+                              cache_path=args.cache, count_limit=args.count)
+    finally:
+        if args.output:
+            output.close()
+    print(summary, file=sys.stderr)
@@ -0,0 +1,76 @@
+# Regular import
+import sys
+import argparse
+
+# Core Objects
+from core.csp import CSP
+from core.game import Game
+from core.bitboard import BitboardCSP
+from core.placement import PlacementCSP
+from core.sat import SatCSP
+
+# Constraints
+from constraints.m_constraint import MConstraint
+from constraints.border_constraint import BorderConstraint
+from constraints.global_constraints import GlobalConstraints
+
+# Heuristics
+from heuristics.value import LCV
+from heuristics.variable import MRV, MaxDegree
+
+# Methods
+from methods.ac3 import AC3, MAC
+from methods.forward_check import ForwardCheck
+
+# Process
+from app.benchmark import generate_corpus, strategy_matrix, run_benchmark, compare, save_results, load_results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every combination of heuristics and methods on generated puzzles")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6, 7], help="Board sizes")
+    parser.add_argument("--boats", default="321", help="Number of boats for each size, like in the input files")
+    parser.add_argument("--hints", type=float, default=0.2, help="Probability for each boat cell to be given as a hint")
+    parser.add_argument("--seeds", type=int, default=3, help="Number of puzzles for each board size")
+    parser.add_argument("--engine", default="csp", choices=["csp", "bitboard", "placement", "sat"])
+    parser.add_argument("--repeat", type=int, default=1, help="Number of runs of each combination, the fastest is kept")
+    parser.add_argument("--timeout", type=float, default=30, help="Maximum time in seconds for each run")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file where the results are written")
+    parser.add_argument("--baseline", default=None, help="Results of a previous benchmark to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative increase flagged as a regression")
+    args = parser.parse_args()
+
+    builders = dict(
+        m_constraint_builder = MConstraint,
+        border_constraint_builder = BorderConstraint,
+        game_builder = Game,
+        csp_builder = CSP,
+        global_constraints = GlobalConstraints,
+        MRV = MRV,
+        LCV = LCV,
+        MaxDegree = MaxDegree,
+        AC3 = AC3,
+        ForwardCheck = ForwardCheck,
+        MAC = MAC,
+        BitboardCSP = BitboardCSP,
+        PlacementCSP = PlacementCSP,
+        SatCSP = SatCSP,
+    )
+    parameters = dict(sizes=args.sizes, boats=[int(nb) for nb in args.boats], hints=args.hints,
+                      seeds=list(range(args.seeds)), engine=args.engine)
+    if args.baseline:
+        # The corpus of the baseline is generated again, so both runs solve the same puzzles
+        baseline_parameters, baseline = load_results(args.baseline)
+        parameters = dict(baseline_parameters, engine=args.engine)
+
+    corpus = generate_corpus(parameters["sizes"], parameters["boats"], parameters["hints"], parameters["seeds"])
+    matrix = strategy_matrix(MRV, MaxDegree, LCV, AC3, ForwardCheck)
+    results = run_benchmark(corpus, builders, matrix, engine=parameters["engine"], repeat=args.repeat,
+                            timeout=args.timeout, verbose=True)
+    save_results(args.output, results, parameters)
+
+    if args.baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print("REGRESSION {puzzle} {strategy} {metric}: {baseline} -> {value}".format(**r))
+        print("{} regressions above {:.0%}".format(len(regressions), args.threshold))
+        sys.exit(1 if regressions else 0)
@@ -33,4 +33,12 @@ class BorderConstraint(Constraint):
         """
         Returns the border cell involved in this constraint.
         """
-        return [self.border_cell]
\ No newline at end of file
+        return [self.border_cell]
+
+
+    @property
+    def shape_only(self):
+        """
+        Returns True because every cell has a border constraint with each of its neighbours, whatever the hints are
+        """
+        return True
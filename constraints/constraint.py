@@ -13,4 +13,12 @@ class Constraint:
         """
         Raises an error when the property is called from this class
         """
-        raise NotImplementedError(f"property involved_cells should be implemented in class : {type(self).__name__}")
\ No newline at end of file
+        raise NotImplementedError(f"property involved_cells should be implemented in class : {type(self).__name__}")
+
+
+    @property
+    def shape_only(self):
+        """
+        Returns True if the cells involved in the constraint only depend on the shape of the board (not on the hints), else False
+        """
+        return False
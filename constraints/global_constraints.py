@@ -1,6 +1,61 @@
 class GlobalConstraints:
     """This class is a storage class that contains the definition of all global constraints"""
 
+    @staticmethod
+    def scope(constraint, value, var, assignement, game):
+        """
+        Finds the cells a failed global constraint depends on (used to explain the failure)
+        - constraint: One of the global constraints of this class
+        - value: The value of the cell in parameter
+        - var: The cell that is getting a new value
+        - assignement: The current assignement of CSP
+        - game: the loaded game informations
+
+        Returns the list of cells, or None if the failure depends on the whole board
+        """
+        rows, cols = game.get_shape
+        x, y = var
+        directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        if constraint is GlobalConstraints.respect_cardinality:
+            # Only the row or the column whose count is exceeded
+            boat = 1 if value > 0 else 0
+            row_ok = assignement.row_boats[x] + boat <= game.rows[x] and assignement.row_water[x] + 1 - boat <= cols - game.rows[x]
+            return [(i, y) for i in range(rows)] if row_ok else [(x, j) for j in range(cols)]
+        if constraint is GlobalConstraints.check_boat_size:
+            return [(x + i * dx, y + i * dy) for dx, dy in directions for i in range(1, value + 1)]
+        if constraint is GlobalConstraints.check_nb_boat and value > 0:
+            nb_boat = game.boats.get(value, 0)
+            if (assignement.missing_cells - 1 > assignement.free_cells - 1 or assignement.boat_cells[value] + 1 > nb_boat * value
+                    or assignement.ships[value] + assignement.ship_delta(var, value) > nb_boat):
+                return None
+            # The boat has no room to reach its size: the cells of its row and column around it
+            return [(x + i * dx, y + i * dy) for dx, dy in directions for i in range(1, value + 3)]
+        if constraint is GlobalConstraints.check_nb_boat:
+            if assignement.missing_cells > assignement.free_cells - 1:
+                return None
+            # A neighbour boat would be closed too early: the neighbours and the cells of their rows and columns around them
+            size = game.max_boat_size
+            return [
+                (x + nx + i * dx, y + ny + i * dy) for nx, ny in directions for dx, dy in directions for i in range(size + 3)
+            ]
+        return None
+
+
+    @staticmethod
+    def radius(constraint, value, game):
+        """
+        Finds how far from the cell a global constraint reads the assignment, when it only depends on the cells around it
+        - constraint: One of the global constraints of this class
+        - value: The value of the cell
+        - game: the loaded game informations
+
+        Returns the number of cells read in each direction (row and column of the cell), or None if it depends on the whole board
+        """
+        if constraint is GlobalConstraints.check_boat_size:
+            return value
+        return None
+
+
     @staticmethod
     def respect_cardinality(value, var, assignement, game):
         """
@@ -14,24 +69,13 @@ class GlobalConstraints:
         """
         rows, cols = game.get_shape
         row, col = var
-        boat_counts = [1, 1] if value > 0 else [0, 0] # We check the current value in initialization
-        water_counts = [1, 1] if value == 0 else [0, 0] # We check the current value in initialization
-        # Count every boats and water cells for each rows and columns
-        for x, y in assignement.keys():
-            if x == row:
-                if assignement[x, y] > 0:
-                    boat_counts[0] += 1
-                else:
-                    water_counts[0] += 1
-            if y == col:
-                if assignement[x, y] > 0:
-                    boat_counts[1] += 1
-                else:
-                    water_counts[1] += 1
+        # The assignment keeps the counts of every row and column, we only add the current value
+        boat = 1 if value > 0 else 0
+        water = 1 - boat
         # boat_counts can't be superior than game.rows in each row and game.cols in each col
-        boat_cond = boat_counts[0] <= game.rows[row] and boat_counts[1] <= game.cols[col]
+        boat_cond = assignement.row_boats[row] + boat <= game.rows[row] and assignement.col_boats[col] + boat <= game.cols[col]
         # we also need to check if there is still enough space for the require number of boat
-        water_cond = water_counts[0] <= rows - game.rows[row] and water_counts[1] <= cols - game.cols[col]
+        water_cond = assignement.row_water[row] + water <= cols - game.rows[row] and assignement.col_water[col] + water <= rows - game.cols[col]
         return boat_cond and water_cond
 
     @staticmethod
@@ -74,7 +118,23 @@ class GlobalConstraints:
 
         Returns True if condition is respected, else False.
         """
+        # Every boat cell still needed must fit in the cells that are not assigned yet
+        boat = 1 if value > 0 else 0
+        if assignement.missing_cells - boat > assignement.free_cells - 1:
+            return False
         if value > 0:
-            count = list(assignement.values()).count(value)
-            return (count + 1) / value <= game.boats[value]  # +1 to count the boat we are trying to place
-        return True
\ No newline at end of file
+            nb_boat = game.boats.get(value, 0)
+            # The assignment keeps the number of cells and of completed boats for each size
+            if assignement.boat_cells[value] + 1 > nb_boat * value:  # +1 to count the boat we are trying to place
+                return False
+            if assignement.ships[value] + assignement.ship_delta(var, value) > nb_boat:
+                return False
+            # The boat must still be able to reach its size
+            return assignement.has_room(var, value)
+        # A water cell must not close a boat that is still too small
+        x, y = var
+        for cell in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]:
+            if cell in assignement and assignement[cell] > 0:
+                if not assignement.has_room(cell, assignement[cell], water=var):
+                    return False
+        return True
@@ -0,0 +1,16 @@
+# Regular import
+import sys
+import argparse
+
+# Utils
+from app.utils.config_loader import ConfigLoader
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a corpus of BattleShip puzzles to the memory mapped .corpus format")
+    parser.add_argument("corpus", help="Directory of .txt input files or .jsonl file with one puzzle per line")
+    parser.add_argument("output", help=".corpus file where the puzzles are written")
+    args = parser.parse_args()
+
+    if not args.output.endswith(".corpus"):
+        parser.error("The output file must have the .corpus extension")
+    print(f"{ConfigLoader.convert_corpus(args.corpus, args.output)} puzzles written in {args.output}", file=sys.stderr)
@@ -0,0 +1,165 @@
+class Assignment(dict):
+    """This class is the current assignment of the CSP. It behaves like a dictionnary of {cell: value}
+    but also keeps the following counters up to date, so the global constraints don't have to compute them again on every check:
+    - the number of boat and water cells of each row and column
+    - the number of boat cells and of completed boats for each boat size
+    The packed values around each cell of core.check_cache, when they are attached, are also updated with every change.
+    """
+
+    def __init__(self, game):
+        super().__init__()
+        self.game = game
+        self.shape = game.get_shape
+        rows, cols = self.shape
+        self.row_boats = [0] * rows
+        self.row_water = [0] * rows
+        self.col_boats = [0] * cols
+        self.col_water = [0] * cols
+
+        self.nb_variables = len(game.variables)
+        self.fleet_cells = sum(size * nb for size, nb in game.boats.items())
+        self.nb_boats = 0  # Number of boat cells of any size
+        self.boat_cells = [0] * (game.max_boat_size + 1)  # Number of cells for each boat size
+        self.ships = [0] * (game.max_boat_size + 1)  # Number of completed boats for each boat size
+        self.signatures = None  # Packed values of the cells around every cell, attached by CheckCache
+
+
+    def __setitem__(self, var, value):
+        # A cell can be reassigned directly (heuristics and methods test values this way)
+        if var in self:
+            del self[var]
+        if value > 0:
+            self.ships[value] += self.ship_delta(var, value)
+        super().__setitem__(var, value)
+        self._count(var, value, 1)
+        if self.signatures is not None:
+            self.signatures.update(var, value, 1)
+
+
+    def __delitem__(self, var):
+        value = self[var]
+        super().__delitem__(var)
+        self._count(var, value, -1)
+        if self.signatures is not None:
+            self.signatures.update(var, value, -1)
+        if value > 0:
+            self.ships[value] -= self.ship_delta(var, value)
+
+
+    def __reduce__(self):
+        # pickle would set the cells before the counters exist, the copy is built from the game and the cells are assigned again
+        return (self.__class__, (self.game,), None, None, iter(list(self.items())))
+
+
+    def clear(self):
+        super().clear()
+        for counts in (self.row_boats, self.row_water, self.col_boats, self.col_water, self.boat_cells, self.ships):
+            counts[:] = [0] * len(counts)
+        self.nb_boats = 0
+        if self.signatures is not None:
+            self.signatures.bind(self)
+
+
+    def _count(self, var, value, step):
+        """
+        Updates the counters of the row, the column and the boat size of a cell
+        - var: The cell that is assigned or unassigned
+        - value: The value of the cell
+        - step: 1 when the cell is assigned, -1 when it is unassigned
+        """
+        row, col = var
+        if value > 0:
+            self.row_boats[row] += step
+            self.col_boats[col] += step
+            self.boat_cells[value] += step
+            self.nb_boats += step
+        else:
+            self.row_water[row] += step
+            self.col_water[col] += step
+
+
+    @property
+    def missing_cells(self):
+        """
+        Returns the number of boat cells that still have to be placed to complete the fleet
+        """
+        return self.fleet_cells - self.nb_boats
+
+
+    @property
+    def free_cells(self):
+        """
+        Returns the number of cells that have not been assigned yet
+        """
+        return self.nb_variables - len(self)
+
+
+    def run(self, var, value, direction, water=None):
+        """
+        Follows the cells of the same boat from a cell in one direction
+        - var: The cell we start from (not counted)
+        - value: The boat size we follow
+        - direction: The (dx, dy) step to follow
+        - water: An unassigned cell that must be considered as water
+
+        Returns the number of cells of the same boat found (at most value + 1), and True if the boat could still
+        grow in this direction (the next cell is in the board and not assigned yet), else False
+        """
+        rows, cols = self.shape
+        x, y = var
+        count = 0
+        while count <= value:
+            x, y = x + direction[0], y + direction[1]
+            if not (0 <= x < rows and 0 <= y < cols) or (x, y) == water:
+                return count, False
+            if (x, y) not in self:
+                return count, True
+            if self[x, y] != value:
+                return count, False
+            count += 1
+        return count, False
+
+
+    def ship_delta(self, var, value):
+        """
+        Computes how the number of completed boats of a size changes when a cell takes this size
+        - var: The cell (not assigned) that is getting the value
+        - value: The boat size tested for the cell
+
+        Returns the number of completed boats gained (can be negative when the cell joins an already completed boat)
+        """
+        right, _ = self.run(var, value, (0, 1))
+        left, _ = self.run(var, value, (0, -1))
+        down, _ = self.run(var, value, (1, 0))
+        up, _ = self.run(var, value, (-1, 0))
+        if value == 1:
+            return 1 if right + left + down + up == 0 else 0
+        # A boat is completed as soon as its cells are aligned, check_boat_size ensures it is never longer than its size
+        delta = 0
+        for first, second in [(right, left), (down, up)]:
+            delta += (first + second + 1 == value) - (first == value) - (second == value)
+        return delta
+
+
+    def has_room(self, var, value, water=None):
+        """
+        Checks that the boat a cell belongs to can still reach its size
+        - var: The cell of the boat
+        - value: The size of the boat
+        - water: An unassigned cell that must be considered as water
+
+        Returns True if the boat is completed or can still grow enough, else False
+        """
+        right, right_open = self.run(var, value, (0, 1), water)
+        left, left_open = self.run(var, value, (0, -1), water)
+        down, down_open = self.run(var, value, (1, 0), water)
+        up, up_open = self.run(var, value, (-1, 0), water)
+        horizontal, vertical = 1 + right + left, 1 + down + up
+        if horizontal >= value or vertical >= value:
+            return True
+        # Once two cells are aligned, the boat can only grow in that direction
+        if horizontal > 1:
+            return right_open or left_open
+        if vertical > 1:
+            return down_open or up_open
+        return right_open or left_open or down_open or up_open
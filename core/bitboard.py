@@ -0,0 +1,367 @@
+import time
+
+from core.csp import CSP
+
+class BitboardCSP(CSP):
+    """This class solves the same problem as CSP but represents the board as integer bitmasks instead of dictionnaries.
+    There is one mask per value of the domain (0 for water and one for each boat size), a bit is set when the cell can still take this value.
+    A cell is assigned as soon as only one of its bits is left, and the unknown cells are those with several bits.
+    Every constraint (diagonals, neighbours, row/column counts, boat sizes and fleet) is checked with shift and mask operations on a whole board at once.
+
+    The cells are stored row by row with an extra empty column, so a shift never wraps a boat from one row to the next one.
+    The search is not logged in a search trace.
+    """
+
+    traced = False
+
+    def __init__(self, game, domains, constraints, global_constraints, format_solution, network=None):
+        super().__init__(game, domains, constraints, global_constraints, format_solution, network)
+        rows, cols = game.get_shape
+        self.width = cols + 1
+        self.nb_values = game.max_boat_size + 1
+        self.board_mask = 0
+        for x in range(rows):
+            self.board_mask |= ((1 << cols) - 1) << (x * self.width)
+        self.row_masks = [((1 << cols) - 1) << (x * self.width) for x in range(rows)]
+        self.col_masks = [sum(1 << (x * self.width + y) for x in range(rows)) for y in range(cols)]
+        # For each boat size, the rows (and columns) that have enough boat cells to hold it
+        self.wide_rows = [sum(m for m, count in zip(self.row_masks, game.rows) if count >= value) for value in range(self.nb_values)]
+        self.wide_cols = [sum(m for m, count in zip(self.col_masks, game.cols) if count >= value) for value in range(self.nb_values)]
+
+        # Initial masks built from the domains (the hints are already applied in them)
+        self.initial_masks = [0] * self.nb_values
+        for (x, y), values in domains.items():
+            for value in values:
+                self.initial_masks[value] |= self.bit((x, y))
+        # Sizes that are not part of the fleet can't be used
+        for value in range(1, self.nb_values):
+            if game.boats.get(value, 0) == 0:
+                self.initial_masks[value] = 0
+
+        # Hints that give the direction of a boat also tell that the cell behind it is water
+        # and a middle part must have boats on two opposite sides
+        self.middle_cells = []
+        for x in range(rows):
+            for y in range(cols):
+                sign = game.board[x, y]
+                behind = {"<": (x, y - 1), ">": (x, y + 1), "^": (x - 1, y), "v": (x + 1, y)}.get(sign)
+                if behind and 0 <= behind[0] < rows and 0 <= behind[1] < cols:
+                    for value in range(1, self.nb_values):
+                        self.initial_masks[value] &= ~self.bit(behind)
+                elif sign == "M":
+                    self.middle_cells.append(self.bit((x, y)))
+
+
+    def bit(self, cell):
+        """
+        Returns the mask with only the bit of a cell
+        - cell: The cell of the board
+        """
+        return 1 << (cell[0] * self.width + cell[1])
+
+
+    def orthogonal(self, mask):
+        """
+        Returns the mask of the cells stuck to the cells of a mask (not the diagonal cells)
+        - mask: The cells whose neighbours we are looking for
+        """
+        w = self.width
+        return ((mask << 1) | (mask >> 1) | (mask << w) | (mask >> w)) & self.board_mask
+
+
+    def diagonal(self, mask):
+        """
+        Returns the mask of the diagonal cells of the cells of a mask
+        - mask: The cells whose neighbours we are looking for
+        """
+        w = self.width
+        return ((mask << (w + 1)) | (mask << (w - 1)) | (mask >> (w + 1)) | (mask >> (w - 1))) & self.board_mask
+
+
+    def stream(self):
+        """
+        Streams the solutions one at a time for iter_solutions, the search is suspended after each solution and resumed from the same node.
+
+        Yields each solution as a dictionnary {cell: value}
+        """
+        self.start_time = time.time()
+        self.end_time = None
+        self.frames = []
+        masks = self.propagate(list(self.initial_masks))
+        if masks is not None:
+            for solution in self.search(masks):
+                self.end_time = time.time()
+                yield self.to_assignment(solution)
+        self.end_time = time.time()
+
+
+    def backtrack(self, masks):
+        """
+        This is the backtracking method on the masks. The masks given are already propagated.
+        - masks: The list of masks of the current node
+
+        Returns the masks of the solution if it exists, else None .
+        """
+        return next(self.search(masks), None)
+
+
+    def search(self, masks, cell=None, values=None):
+        """
+        Explores the search tree from propagated masks. The search is iterative, self.frames is the explicit stack of the branch
+        - masks: The list of masks of the current node
+        - cell: The mask of the cell to branch on, selected with select_unassigned_cell by default
+        - values: The values tried for the cell, every value left (biggest first) by default
+
+        Yields the masks of every solution
+        """
+        frames = self.frames
+        base = len(frames)
+        while True:
+            # Enter a new node
+            if self.work_sharing is not None:
+                self.work_sharing.poll(self)
+            if self.budget is not None:
+                self.budget.poll(self)
+            if cell is None:
+                cell = self.select_unassigned_cell(masks)
+                values = [value for value in range(self.nb_values - 1, -1, -1) if masks[value] & cell]
+            if cell == 0:
+                yield masks
+                if len(frames) > base:
+                    self.number_of_backtracks += 1
+            else:
+                frames.append((masks, cell, list(values)))  # Another process can take the values left (see share_work)
+            cell = None
+
+            # Try the next value of the deepest node, and go back up when a node has no value left
+            entered = False
+            while len(frames) > base:
+                node_masks, node_cell, remaining = frames[-1]
+                if not remaining:
+                    frames.pop()
+                    if len(frames) > base:
+                        self.number_of_backtracks += 1
+                    continue
+                value = remaining.pop(0)
+                self.node_expansions += 1
+                child = [mask & ~node_cell for mask in node_masks]
+                child[value] |= node_cell
+                child = self.propagate(child)
+                if child is None:
+                    self.number_of_backtracks += 1
+                    continue
+                masks = child
+                entered = True
+                break
+            if not entered:
+                return
+
+
+    def root_subproblem(self):
+        """
+        Returns the root of the search as a subproblem for the parallel search: (propagated masks, cell mask or None, values or None),
+        None if the puzzle has no solution
+        """
+        self.frames = []
+        masks = self.propagate(list(self.initial_masks))
+        return (masks, None, None) if masks is not None else None
+
+
+    def expand(self, subproblem):
+        """
+        Branches once on a subproblem
+        - subproblem: see root_subproblem
+
+        Returns the subproblems of the children and the solution if the subproblem is already complete, else None
+        """
+        masks, cell, values = subproblem
+        if cell is None:
+            cell = self.select_unassigned_cell(masks)
+            if cell == 0:
+                return [], self.to_assignment(masks)
+            values = [value for value in range(self.nb_values - 1, -1, -1) if masks[value] & cell]
+        children = []
+        for value in values:
+            self.node_expansions += 1
+            child = [mask & ~cell for mask in masks]
+            child[value] |= cell
+            child = self.propagate(child)
+            if child is not None:
+                children.append((child, None, None))
+        return children, None
+
+
+    def search_subproblem(self, subproblem):
+        """
+        Explores a subproblem
+        - subproblem: see root_subproblem
+
+        Yields every solution of the subproblem
+        """
+        self.frames = []
+        for solution in self.search(*subproblem):
+            yield self.to_assignment(solution)
+
+
+    def share_work(self):
+        """
+        Takes the values left in the shallowest node of the current branch, so another process can explore them
+
+        Returns the subproblem of these values, None if there are no values left
+        """
+        for masks, cell, remaining in self.frames:
+            if remaining:
+                values = list(remaining)
+                remaining.clear()
+                return (masks, cell, values)
+        return None
+
+
+    def select_unassigned_cell(self, masks):
+        """
+        Selects the unknown cell with the fewest values left (MRV) by counting the bits of each cell on the whole board
+
+        Returns the mask of the selected cell, 0 when every cell is assigned
+        """
+        at_least_one, at_least_two, at_least_three = 0, 0, 0
+        for mask in masks:
+            at_least_three |= at_least_two & mask
+            at_least_two |= at_least_one & mask
+            at_least_one |= mask
+        candidates = at_least_two & ~at_least_three
+        if not candidates:
+            candidates = at_least_two
+        # Keep the lowest bit
+        return candidates & -candidates
+
+
+    def fixed_masks(self, masks):
+        """
+        Returns the masks of the cells that can only take one value, for each value
+        - masks: The list of masks of the current node
+        """
+        at_least_one, at_least_two = 0, 0
+        for mask in masks:
+            at_least_two |= at_least_one & mask
+            at_least_one |= mask
+        single = at_least_one & ~at_least_two
+        return [mask & single for mask in masks], at_least_one
+
+
+    def propagate(self, masks):
+        """
+        Removes every value that breaks a constraint until nothing changes anymore
+        - masks: The list of masks to reduce (updated in place)
+
+        Returns the reduced masks, or None if a cell has no value left or a constraint can't be respected anymore
+        """
+        game = self.game
+        w = self.width
+        while True:
+            self.number_of_constraint_checks += 1
+            fixed, possible = self.fixed_masks(masks)
+            if self.board_mask & ~possible:
+                return None
+            boats = 0
+            for value in range(1, self.nb_values):
+                boats |= fixed[value]
+            may_be_boat = 0
+            for value in range(1, self.nb_values):
+                may_be_boat |= masks[value]
+            new = list(masks)
+
+            # Diagonals of a boat are water, and only the same boat or water can be stuck to a boat
+            water = self.diagonal(boats)
+            for value in range(1, self.nb_values):
+                neighbours = self.orthogonal(fixed[value])
+                if value == 1:
+                    water |= neighbours
+                for other in range(1, self.nb_values):
+                    if other != value:
+                        new[other] &= ~neighbours
+            for value in range(1, self.nb_values):
+                new[value] &= ~water
+
+            for value in range(2, self.nb_values):
+                mask = fixed[value]
+                for step in [1, w]:
+                    # A boat can't be longer than its size
+                    longer = mask
+                    for k in range(1, value + 1):
+                        longer &= mask >> (k * step)
+                    if longer:
+                        return None
+                    # Both ends of a completed boat are water
+                    starts = mask
+                    for k in range(1, value):
+                        starts &= mask >> (k * step)
+                    ends = ((starts >> step) | (starts << (value * step))) & self.board_mask
+                    for other in range(1, self.nb_values):
+                        new[other] &= ~ends
+                # A cell can only keep a boat size if a whole boat of this size fits through it
+                allowed = masks[value]
+                room = 0
+                for step, lines in [(1, self.wide_rows[value]), (w, self.wide_cols[value])]:
+                    starts = allowed & lines
+                    for k in range(1, value):
+                        starts &= allowed >> (k * step)
+                    for k in range(value):
+                        room |= starts << (k * step)
+                new[value] &= room
+
+            # Rows and columns counts
+            for lines, counts in [(self.row_masks, game.rows), (self.col_masks, game.cols)]:
+                for line, count in zip(lines, counts):
+                    placed = (boats & line).bit_count()
+                    maximum = (may_be_boat & line).bit_count()
+                    if placed > count or maximum < count:
+                        return None
+                    if placed == count and maximum > count:
+                        for value in range(1, self.nb_values):
+                            new[value] &= ~line | boats
+                    elif maximum == count and placed < count:
+                        new[0] &= ~(line & may_be_boat)
+
+            # Fleet: the number of cells of each size must match game.boats
+            for value in range(1, self.nb_values):
+                needed = game.boats.get(value, 0) * value
+                placed = fixed[value].bit_count()
+                maximum = masks[value].bit_count()
+                if placed > needed or maximum < needed:
+                    return None
+                if placed == needed and maximum > needed:
+                    new[value] &= fixed[value]
+                elif maximum == needed and placed < needed:
+                    for other in range(self.nb_values):
+                        if other != value:
+                            new[other] &= ~masks[value]
+
+            # Middle parts: both horizontal or both vertical neighbours must be boats
+            for cell in self.middle_cells:
+                horizontal = ((cell << 1) | (cell >> 1)) & self.board_mask
+                vertical = ((cell << w) | (cell >> w)) & self.board_mask
+                horizontal_ok = horizontal.bit_count() == 2 and (horizontal & may_be_boat) == horizontal
+                vertical_ok = vertical.bit_count() == 2 and (vertical & may_be_boat) == vertical
+                if not horizontal_ok and not vertical_ok:
+                    return None
+                if not vertical_ok:
+                    new[0] &= ~horizontal
+                elif not horizontal_ok:
+                    new[0] &= ~vertical
+
+            if new == masks:
+                return masks
+            self.pruned_values += sum((old & ~mask).bit_count() for old, mask in zip(masks, new))
+            masks[:] = new
+
+
+    def to_assignment(self, masks):
+        """
+        Converts the masks of a solution to the assignment format used by CSP
+        - masks: The list of masks of the solution
+
+        Returns a dictionnary {cell: value}, or None if there is no solution
+        """
+        if masks is None:
+            return None
+        return {var: next(value for value in range(self.nb_values) if masks[value] & self.bit(var)) for var in self.game.variables}
@@ -0,0 +1,109 @@
+import time
+import threading
+
+
+class BudgetExceeded(Exception):
+    """Raised in the search when a limit of its budget has been reached, the message is the limit ("time", "nodes", "backtracks" or "cancelled")"""
+
+
+class CancellationToken:
+    """This class lets another thread stop a search: the search checks the token at each node and stops once cancel has been called"""
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+    def cancel(self):
+        """
+        Asks the search to stop at its next node
+        """
+        self.event.set()
+
+
+    @property
+    def cancelled(self):
+        """
+        Returns True if cancel has been called, else False
+        """
+        return self.event.is_set()
+
+
+class Budget:
+    """This class limits a search. It is checked at each node of the search (see CSP.iter_solutions),
+    which is stopped with an "unknown" status as soon as a limit is reached, the metrics are then the ones of the partial search.
+    It also reports the progress of the search every interval nodes.
+    """
+
+    def __init__(self, time=None, nodes=None, backtracks=None, token=None, progress=None, interval=1000):
+        """
+        - time: Maximum time in seconds, None for no limit
+        - nodes: Maximum number of node expansions, None for no limit
+        - backtracks: Maximum number of backtracks, None for no limit
+        - token: CancellationToken checked at each node, None if the search can't be cancelled
+        - progress: Function called every interval nodes with a dictionnary of the depth, the elapsed time and the metrics
+        - interval: Number of nodes between two calls of progress
+        """
+        self.time = time
+        self.nodes = nodes
+        self.backtracks = backtracks
+        self.token = token
+        self.progress = progress
+        self.interval = interval
+        self.start_time = None
+        self.start_nodes = 0
+        self.start_backtracks = 0
+        self.calls = 0
+
+
+    def start(self, csp):
+        """
+        Starts counting, the limits apply from now
+        - csp: The CSP searched, its metrics are the reference of the node and backtrack limits
+        """
+        self.start_time = time.time()
+        self.start_nodes = csp.node_expansions
+        self.start_backtracks = csp.number_of_backtracks
+        self.calls = 0
+
+
+    def exceeded(self, csp):
+        """
+        Returns the first limit reached ("cancelled", "nodes", "backtracks" or "time"), None if the search can go on
+        """
+        if self.token is not None and self.token.cancelled:
+            return "cancelled"
+        if self.nodes is not None and csp.node_expansions - self.start_nodes >= self.nodes:
+            return "nodes"
+        if self.backtracks is not None and csp.number_of_backtracks - self.start_backtracks >= self.backtracks:
+            return "backtracks"
+        if self.time is not None and time.time() - self.start_time >= self.time:
+            return "time"
+        return None
+
+
+    def poll(self, csp, depth=None):
+        """
+        Called by the search at each node, raises BudgetExceeded when a limit is reached
+        - csp: The CSP searched
+        - depth: Depth of the node, the number of frames of csp by default
+        """
+        self.calls += 1
+        reason = self.exceeded(csp)
+        if reason is not None:
+            raise BudgetExceeded(reason)
+        if self.progress is not None and self.calls % self.interval == 0:
+            self.progress(self.report(csp, len(csp.frames) if depth is None else depth))
+
+
+    def report(self, csp, depth):
+        """
+        Returns the progress of the search as a dictionnary: depth, elapsed time and metrics
+        """
+        return {
+            "depth": depth,
+            "time": time.time() - self.start_time,
+            "node_expansions": csp.node_expansions,
+            "number_of_backtracks": csp.number_of_backtracks,
+            "number_of_constraint_checks": csp.number_of_constraint_checks,
+            "pruned_values": csp.pruned_values,
+        }
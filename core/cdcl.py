@@ -0,0 +1,359 @@
+import heapq
+
+
+class CDCL:
+    """This class is a small conflict-driven clause learning SAT solver, used when no external solver is configured (see core.sat).
+    A literal is a non-zero integer like in the DIMACS format: v is the variable v true and -v the variable v false.
+    - Unit propagation with two watched literals per clause
+    - First UIP conflict analysis, the learnt clause is kept and the search jumps back to its second highest level
+    - VSIDS variable order (activities bumped at each conflict, kept in a heap) with phase saving
+    - Luby restarts
+    - Learnt clauses reduced at the restarts: when there are more than max_learnts of them, the half with the highest LBD
+      (number of decision levels of their literals when they were learnt) is deleted, the clauses with an LBD of 2 or less are always kept
+
+    Clauses can be added between two calls of solve, so the solutions can be enumerated with blocking clauses.
+    """
+
+    def __init__(self, nb_vars=0, restart_unit=100, decay=0.95, max_learnts=None, learnts_growth=1.1):
+        """
+        - nb_vars: Number of variables, more can be added with new_var
+        - restart_unit: Number of conflicts of the first restart interval (the next ones follow the Luby sequence)
+        - decay: Decay of the activities, the increment grows by 1 / decay at each conflict
+        - max_learnts: Number of learnt clauses kept before they are reduced, a third of the clauses (at least 1000) by default
+        - learnts_growth: The limit of learnt clauses is multiplied by learnts_growth after each reduction
+        """
+        self.nb_vars = 0
+        self.values = [0]  # 1 (true), -1 (false) or 0 (unassigned) for each variable, index 0 is unused
+        self.levels = [0]
+        self.reasons = [None]
+        self.phases = [-1]  # Last value of each variable, it is tried first
+        self.activities = [0.0]
+        self.watches = {}
+        self.clauses = []
+        self.learnts = []
+        self.lbds = {}  # LBD of each learnt clause, by id of the clause
+        self.max_learnts = max_learnts
+        self.learnts_growth = learnts_growth
+        self.trail = []
+        self.trail_limits = []  # Position in the trail where each decision level starts
+        self.head = 0  # Position in the trail of the next literal to propagate
+        self.heap = []
+        self.increment = 1.0
+        self.decay = decay
+        self.restart_unit = restart_unit
+        self.unsat = False
+
+        # Some performance metrics
+        self.decisions = 0
+        self.conflicts = 0
+        self.propagations = 0
+        self.deleted = 0  # Learnt clauses deleted by reduce
+
+        for _ in range(nb_vars):
+            self.new_var()
+
+
+    def new_var(self):
+        """
+        Returns a new variable
+        """
+        self.nb_vars += 1
+        var = self.nb_vars
+        self.values.append(0)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.phases.append(-1)
+        self.activities.append(0.0)
+        self.watches[var] = []
+        self.watches[-var] = []
+        heapq.heappush(self.heap, (0.0, var))
+        return var
+
+
+    def value(self, lit):
+        """
+        Returns 1 if the literal is true, -1 if it is false and 0 if its variable is unassigned
+        """
+        return self.values[lit] if lit > 0 else -self.values[-lit]
+
+
+    @property
+    def level(self):
+        """
+        Returns the current decision level
+        """
+        return len(self.trail_limits)
+
+
+    def add_clause(self, lits):
+        """
+        Adds a clause, the solver goes back to the level 0 first
+        - lits: The literals of the clause
+
+        Returns False if the clauses are now unsatisfiable, else True
+        """
+        self.cancel_until(0)
+        if self.unsat:
+            return False
+        clause = []
+        for lit in dict.fromkeys(lits):
+            value = self.value(lit)
+            if value == 1 or -lit in clause:
+                return True  # The clause is already satisfied
+            if value == 0:
+                clause.append(lit)
+        if not clause:
+            self.unsat = True
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            self.unsat = self.propagate() is not None
+        else:
+            self.clauses.append(clause)
+            self.watch(clause)
+        return not self.unsat
+
+
+    def watch(self, clause):
+        """
+        Watches the two first literals of a clause
+        """
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+
+    def enqueue(self, lit, reason):
+        """
+        Makes a literal true at the current level
+        - reason: The clause that forced it, None for a decision
+        """
+        var = abs(lit)
+        self.values[var] = 1 if lit > 0 else -1
+        self.levels[var] = self.level
+        self.reasons[var] = reason
+        self.trail.append(lit)
+
+
+    def propagate(self):
+        """
+        Makes true the last literal of every clause whose other literals are false, until nothing changes
+
+        Returns the clause that has become false (conflict), None if there is no conflict
+        """
+        values, watches, trail = self.values, self.watches, self.trail
+        while self.head < len(trail):
+            false_lit = -trail[self.head]
+            self.head += 1
+            watchers = watches[false_lit]
+            kept = []
+            conflict = None
+            for i, clause in enumerate(watchers):
+                self.propagations += 1
+                # The false literal is kept in second position
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                if (values[first] if first > 0 else -values[-first]) == 1:
+                    kept.append(clause)
+                    continue
+                # Look for another literal that is not false to watch
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    if (values[lit] if lit > 0 else -values[-lit]) != -1:
+                        clause[1], clause[k] = lit, false_lit
+                        watches[lit].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if (values[first] if first > 0 else -values[-first]) == -1:
+                        conflict = clause
+                        kept.extend(watchers[i + 1:])
+                        break
+                    self.enqueue(first, clause)
+            watches[false_lit] = kept
+            if conflict is not None:
+                return conflict
+        return None
+
+
+    def analyze(self, conflict):
+        """
+        Finds the first unique implication point of a conflict
+
+        Returns the learnt clause (its first literal is the one asserted after the jump) and the level to jump back to
+        """
+        seen = set()
+        learnt = [None]
+        counter = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for other in (clause if lit is None else clause[1:]):
+                var = abs(other)
+                if var not in seen and self.levels[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if self.levels[var] == self.level:
+                        counter += 1
+                    else:
+                        learnt.append(other)
+            # Next literal of the current level on the trail
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.reasons[abs(lit)]
+            # The implied literal is the first of its reason
+            if clause[0] != lit:
+                k = clause.index(lit)
+                clause[0], clause[k] = clause[k], clause[0]
+        learnt[0] = -lit
+        if len(learnt) == 1:
+            return learnt, 0
+        # The literal of the highest level after the asserted one is watched with it
+        k = max(range(1, len(learnt)), key=lambda i: self.levels[abs(learnt[i])])
+        learnt[1], learnt[k] = learnt[k], learnt[1]
+        return learnt, self.levels[abs(learnt[1])]
+
+
+    def bump(self, var):
+        """
+        Increases the activity of a variable involved in a conflict
+        """
+        self.activities[var] += self.increment
+        if self.activities[var] > 1e100:
+            # Rescale every activity to avoid overflows
+            self.activities = [a * 1e-100 for a in self.activities]
+            self.increment *= 1e-100
+            self.heap = [(-self.activities[v], v) for v in range(1, self.nb_vars + 1) if self.values[v] == 0]
+            heapq.heapify(self.heap)
+        elif self.values[var] == 0:
+            heapq.heappush(self.heap, (-self.activities[var], var))
+
+
+    def cancel_until(self, level):
+        """
+        Undoes every assignment made above a level
+        """
+        if self.level <= level:
+            return
+        start = self.trail_limits[level]
+        for lit in self.trail[start:]:
+            var = abs(lit)
+            self.phases[var] = self.values[var]
+            self.values[var] = 0
+            self.reasons[var] = None
+            heapq.heappush(self.heap, (-self.activities[var], var))
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.head = start
+
+
+    def pick(self):
+        """
+        Returns the unassigned variable with the highest activity, None if every variable is assigned
+        """
+        while self.heap:
+            activity, var = heapq.heappop(self.heap)
+            # The heap can have old entries of a variable, only the current one is used
+            if self.values[var] == 0 and -activity == self.activities[var]:
+                return var
+        return None
+
+
+    def reduce(self):
+        """
+        Deletes the half of the learnt clauses with the highest LBD (the shortest first when they are equal), except the clauses
+        with an LBD of 2 or less. Called at level 0, so no deleted clause is the reason of an assigned literal the analysis can reach
+        """
+        lbds = self.lbds
+        glue = [clause for clause in self.learnts if lbds[id(clause)] <= 2]
+        others = sorted((clause for clause in self.learnts if lbds[id(clause)] > 2), key=lambda clause: (lbds[id(clause)], len(clause)))
+        kept, removed = others[:len(others) // 2], others[len(others) // 2:]
+        if not removed:
+            return
+        deleted = {id(clause) for clause in removed}
+        for lit in {lit for clause in removed for lit in clause[:2]}:
+            self.watches[lit] = [clause for clause in self.watches[lit] if id(clause) not in deleted]
+        for clause in removed:
+            del lbds[id(clause)]
+        self.learnts = glue + kept
+        self.deleted += len(removed)
+
+
+    @staticmethod
+    def luby(i):
+        """
+        Returns the i-th term (from 0) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, ...
+        """
+        size, seq = 1, 0
+        while size < i + 1:
+            seq += 1
+            size = 2 * size + 1
+        while size - 1 != i:
+            size = (size - 1) >> 1
+            seq -= 1
+            i %= size
+        return 1 << seq
+
+
+    def solve(self, poll=None):
+        """
+        Looks for an assignment of the variables that satisfies every clause
+        - poll: Function called at each decision and conflict (it can stop the search by raising an exception), None to never stop
+
+        Returns True if the clauses are satisfiable (the model is read with value), else False
+        """
+        self.cancel_until(0)
+        if self.unsat or self.propagate() is not None:
+            self.unsat = True
+            return False
+        if self.max_learnts is None:
+            self.max_learnts = max(len(self.clauses) // 3, 1000)
+        # The learnt clauses of the previous calls (like the enumeration of the solutions) are reduced too
+        if len(self.learnts) > self.max_learnts:
+            self.reduce()
+            self.max_learnts *= self.learnts_growth
+        restarts = 0
+        limit = self.restart_unit
+        conflicts = 0
+        while True:
+            if poll is not None:
+                poll()
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if self.level == 0:
+                    self.unsat = True
+                    return False
+                learnt, level = self.analyze(conflict)
+                lbd = len({self.levels[abs(lit)] for lit in learnt})
+                self.cancel_until(level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.learnts.append(learnt)
+                    self.lbds[id(learnt)] = lbd
+                    self.watch(learnt)
+                    self.enqueue(learnt[0], learnt)
+                self.increment /= self.decay
+                continue
+            if conflicts >= limit:
+                restarts += 1
+                limit = self.restart_unit * self.luby(restarts)
+                conflicts = 0
+                self.cancel_until(0)
+                if len(self.learnts) > self.max_learnts:
+                    self.reduce()
+                    self.max_learnts *= self.learnts_growth
+                continue
+            var = self.pick()
+            if var is None:
+                return True
+            self.decisions += 1
+            self.trail_limits.append(len(self.trail))
+            self.enqueue(var * self.phases[var], None)
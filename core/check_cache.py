@@ -0,0 +1,176 @@
+from collections import OrderedDict
+
+from constraints.global_constraints import GlobalConstraints
+
+# Result of a check that has not been computed yet for an entry
+UNKNOWN = object()
+
+
+class CheckCache:
+    """This class keeps the results of the local constraint checks of a CSP: the unit constraints (border and M constraints)
+    and the global constraints that only read the row and the column of the cell (check_boat_size).
+    These checks only depend on the value tested and on the values of a few cells around the variable, so a result is stored
+    under (variable, value, values of these cells) and is valid for the whole search. The other global constraints are always checked.
+
+    The values around a variable are packed in an integer (bits per cell, 0 when the cell is not assigned, else its value + 1)
+    kept up to date by the assignment: each change of a cell adds its value to the integers of the variables around it (see update).
+    A key is then this integer masked to the cells read for the value, with the index of the (variable, value) in the low bits,
+    so looking up a check costs a few integer operations instead of reading the cells around the variable.
+
+    The cache is attached to a CSP with attach, CSP.is_consistent then goes through it (detach is the switch to turn it off).
+    The least recently used entries are evicted when there are more than max_size. A failure read from the cache is recorded
+    like a computed one (see CSP.fail), so the search explores the same tree, only the number of constraint checks is lower.
+    """
+
+    def __init__(self, max_size=1 << 16):
+        """
+        - max_size: Maximum number of entries kept
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.index = {}  # Index of each variable
+        self.masks = []  # Mask of the cells read for each (variable, value) in the packed integer of the variable
+        self.around = {}  # (index of the variable, shift) of every variable whose packed integer holds a cell
+        self.packed = []  # Packed values around each variable
+        self.assignment = None  # The assignment that updates the packed values
+        self.bits = 0
+        self.pair_bits = 0
+        self.nb_values = 0
+        self.slots = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def attach(self, csp):
+        """
+        Starts caching the checks of a CSP, the entries of another CSP are forgotten
+        """
+        rows, cols = csp.game.get_shape
+        values = range(csp.game.max_boat_size + 1)
+        self.nb_values = len(values)
+        self.bits = len(values).bit_length()  # The values + 1 and 0 for the cells not assigned
+        self.pair_bits = (len(csp.game.variables) * len(values)).bit_length()
+        # Global constraints that only read the cells around the variable, each one has a slot in the entries after the unit constraints
+        local = [glb_cst for glb_cst in csp.global_constraints if GlobalConstraints.radius(glb_cst, 0, csp.game) is not None]
+        self.slots = {glb_cst: k for k, glb_cst in enumerate(local, 1)}
+        # The cells read by the checks of each (variable, value): the cells of its unit constraints and the row and column around it
+        self.index = {var: i for i, var in enumerate(csp.game.variables)}
+        self.masks = []
+        self.around = {var: [] for var in csp.game.variables}
+        for i, var in enumerate(csp.game.variables):
+            x, y = var
+            unit_cells = {cell for cst in csp.constraints[var] for cell in cst.involved_cells}
+            read = []
+            for value in values:
+                cells = set(unit_cells)
+                for glb_cst in local:
+                    for k in range(1, GlobalConstraints.radius(glb_cst, value, csp.game) + 1):
+                        cells.update([(x + k, y), (x - k, y), (x, y + k), (x, y - k)])
+                read.append({(i, j) for i, j in cells if 0 <= i < rows and 0 <= j < cols and (i, j) != var})
+            # Each cell read for one of the values has its bits in the packed integer of the variable
+            shifts = {cell: k * self.bits for k, cell in enumerate(sorted(set().union(*read)))}
+            for cell, shift in shifts.items():
+                self.around[cell].append((i, shift))
+            self.masks.extend(sum(((1 << self.bits) - 1) << shifts[cell] for cell in cells) for cells in read)
+        self.entries.clear()
+        self.assignment = None
+        csp.check_cache = self
+
+
+    @staticmethod
+    def detach(csp):
+        """
+        Stops caching the checks of a CSP, they are all computed again
+        """
+        if csp.check_cache is not None and csp.check_cache.assignment is not None:
+            csp.check_cache.assignment.signatures = None
+        csp.check_cache = None
+
+
+    def bind(self, assignment):
+        """
+        Packs the values around every variable from an assignment, which then updates them with each change
+        (the CSP gets a new assignment when it is reset or restored, the packed values follow it)
+        """
+        if self.assignment is not None and self.assignment is not assignment:
+            self.assignment.signatures = None
+        self.assignment = assignment
+        self.packed = [0] * len(self.index)
+        assignment.signatures = self
+        for var, value in assignment.items():
+            self.update(var, value, 1)
+
+
+    def update(self, var, value, step):
+        """
+        Adds (or removes) the value of a cell to the packed values of the variables around it, called by the assignment
+        - var: The cell that is assigned or unassigned
+        - value: The value of the cell
+        - step: 1 when the cell is assigned, -1 when it is unassigned
+        """
+        packed = self.packed
+        code = step * (value + 1)
+        for i, shift in self.around[var]:
+            packed[i] += code << shift
+
+
+    def is_consistent(self, csp, var, value):
+        """
+        Checks the constraints of a value like CSP.is_consistent, the local checks are read from the cache when they are known
+        """
+        assignment = csp.assignment
+        if assignment.signatures is not self:
+            self.bind(assignment)
+        i = self.index[var]
+        pair = i * self.nb_values + value
+        key = (self.packed[i] & self.masks[pair]) << self.pair_bits | pair
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = self.entries[key] = [UNKNOWN] * (len(self.slots) + 1)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+        # The first unit constraint that fails (None if they all pass)
+        if entry[0] is UNKNOWN:
+            entry[0] = None
+            for cst in csp.constraints[var]:
+                csp.number_of_constraint_checks += 1
+                if not cst.is_valid(value, var, assignment, csp.game):
+                    entry[0] = cst
+                    break
+        if entry[0] is not None:
+            return csp.fail(entry[0], value, var)
+        for glb_cst in csp.global_constraints:
+            slot = self.slots.get(glb_cst)
+            if slot is None:
+                csp.number_of_constraint_checks += 1
+                res = glb_cst(value, var, assignment, csp.game)
+            else:
+                if entry[slot] is UNKNOWN:
+                    csp.number_of_constraint_checks += 1
+                    entry[slot] = glb_cst(value, var, assignment, csp.game)
+                res = entry[slot]
+            if not res:
+                return csp.fail(glb_cst, value, var)
+        return True
+
+
+    @property
+    def stats(self):
+        """
+        Returns the counters of the cache: hits, misses, hit rate, evictions and size
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+        }
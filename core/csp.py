@@ -1,26 +1,52 @@
 import time
 import numpy as np
-import copy
+
+from core.assignment import Assignment
+from core.domain_store import DomainStore
+from core.network import ConstraintNetwork
+from core.parallel import solve_parallel
+from core.budget import BudgetExceeded
+from core.trace import SearchTrace
 
 class CSP:
     """This class models a CSP and can be used to solve a problem as long as it has been properly defined.
     It also has several different heuristics that can be compared and the option of saving the solution found.
     """
 
-    def __init__(self, game, domains, constraints, global_constraints, format_solution):
+    parallel = True  # The engine can split its search between processes (see core.parallel)
+    traced = True  # The search of the engine logs its events in the search trace (see core.trace)
+
+    def __init__(self, game, domains, constraints, global_constraints, format_solution, network=None):
         self.game = game
-        self.domains = domains
-        self.initial_domain = copy.deepcopy(domains)
+        self.domains = DomainStore(domains)
         self.constraints = constraints
+        # Neighbours of each variable, compiled once and shared by methods and heuristics
+        self.network = network if network is not None else ConstraintNetwork(game.variables, constraints, game.get_shape)
         self.strategy = None
         self.global_constraints = global_constraints
         self.format_solution = format_solution
         self.solution = None
         self.accepted_h = ["variable", "value"]
         self.heuristics = {h: [] for h in self.accepted_h}
-        self.accepted_m = ["ac3", "fw_ck"]
+        self.accepted_m = ["ac3", "fw_ck", "mac", "line", "cbj"]
         self.methods = {m: None for m in self.accepted_m}
-        self.assignment = {} 
+        self.assignment = Assignment(game)
+        # Variable and values left of every node of the current branch, so they can be given to another process
+        self.frames = []
+        self.work_sharing = None  # Set in the worker processes of the parallel search (see core.parallel)
+        self.budget = None  # Limits of the current search (see core.budget)
+        self.status = None  # "solved", "unsolvable" or "unknown" (the budget ran out), see iter_solutions
+        self.stop_reason = None
+        self.profiler = None  # Records the time spent in each constraint, method and heuristic (see core.profiler)
+        self.check_cache = None  # Results of the local constraint checks, looked up by the values around the cell (see core.check_cache)
+        self.trace = None  # Binary log of the decisions, prunings, failures and backtracks of the search (see core.trace)
+        # Last failed check (constraint, value, variable) and last variable whose domain was emptied, used to explain failures
+        self.failure = None
+        self.wipeout = None
+        self.weighting = None  # Variable heuristic that learns from the failed checks (see heuristics.variable.DomWdeg)
+        self.dom_wdeg = None  # Weighted degrees of the variables learned by DomWdeg
+        self.ac3_residues = {}  # Last support found by AC3 for each (cell, value, neighbour), see methods.ac3
+        self.backjumping = None  # Explanations of the removed values and nogoods of the search, see methods.backjumping
 
         # Some performance metrics
         self.node_expansions = 0
@@ -33,53 +59,328 @@ class CSP:
         self.end_time = None
 
 
-    def solve(self):
+    def solve(self, workers=None, budget=None, trace_path=None):
         """
         This is the csp solver method that will search for the solution with the specified heuristics.
+        - workers: Number of processes, the search tree is split between them when there are several (see core.parallel).
+          Only for the engines that support it (parallel), the other ones raise a ValueError
+        - budget: Limits of the search (time, nodes, backtracks, cancellation) and progress callback, see core.budget.Budget
+        - trace_path: File where the search is logged (see core.trace), None to disable the trace.
+          Not available with several workers, nor with the engines whose search isn't traced (traced), they raise a ValueError
+
+        Returns the result if it exists, else None . The status tells if there is no solution ("unsolvable")
+        or if the budget ran out before the end of the search ("unknown", the metrics are then the ones of the partial search).
+        """
+        if trace_path is not None and not self.traced:
+            raise ValueError(f"The {type(self).__name__} engine doesn't log its search, the search trace is only available with the csp engine")
+        if workers is not None and workers > 1:
+            if not self.parallel:
+                raise ValueError(f"The {type(self).__name__} engine can't split its search between processes, use one worker")
+            if trace_path is not None:
+                raise ValueError("The search trace is only available with one worker")
+            return solve_parallel(self, workers, budget=budget)
+        if trace_path is None:
+            self.solution = next(self.iter_solutions(budget), None)
+            return self.solution
+        with SearchTrace(trace_path, self) as self.trace:
+            try:
+                self.solution = next(self.iter_solutions(budget), None)
+            finally:
+                self.trace = None
+        return self.solution
 
-        Returns the result if it exists, else None .
+
+    def iter_solutions(self, budget=None):
+        """
+        Streams the solutions of the CSP one at a time. The search is suspended after each solution and resumed from the same node
+        (domains, trail and assignment are kept), so finding the next solution doesn't restart the search.
+        The status is "solved" once a solution has been found, "unsolvable" if the search ended without any,
+        and "unknown" if the budget ran out (stop_reason is then the limit reached).
+        - budget: Limits of the search and progress callback (see core.budget.Budget), None for no limit
+
+        Yields each solution as a dictionnary {cell: value}
+        """
+        self.budget = budget
+        self.status = None
+        self.stop_reason = None
+        if budget is not None:
+            budget.start(self)
+        try:
+            for solution in self.stream():
+                self.status = "solved"
+                yield solution
+        except BudgetExceeded as e:
+            self.status = "unknown"
+            self.stop_reason = str(e)
+            self.end_time = time.time()
+            return
+        if self.status is None:
+            self.status = "unsolvable"
+
+
+    def stream(self):
+        """
+        Runs the search of the engine for iter_solutions
+
+        Yields each solution as a dictionnary {cell: value}
         """
         self.start_time = time.time()
-        if self.methods["ac3"]:
-            self.methods["ac3"].apply(self)
-        self.solution = self.backtrack()
+        self.end_time = None
+        self.unwind()
+        if self.methods["cbj"]:
+            self.methods["cbj"].reset(self)
+        if self.weighting:
+            self.weighting.reset(self)
+        # Arc consistency and line counts before the search (MAC also needs it at the root)
+        root_method = self.methods["ac3"] or self.methods["mac"]
+        if root_method:
+            root_method.apply(self)
+        if self.methods["line"]:
+            self.methods["line"].apply(self)
+        for solution in self.search():
+            self.end_time = time.time()
+            yield dict(solution)
         self.end_time = time.time()
-        return self.solution
 
 
-    def backtrack(self):
+    def unwind(self):
+        """
+        Undoes the branch that a search stopped before its end (like solve, or a budget) left assigned, deepest first,
+        so the assignment and the domains are the ones of the root again
+        """
+        for var, _ in reversed(self.frames):
+            if var in self.assignment:
+                self.unassign(var)
+        self.frames = []
+
+
+    def count_solutions(self, limit=None, budget=None):
+        """
+        Counts the solutions of the CSP, the search stops as soon as limit solutions have been found
+        - limit: Maximum number of solutions to find, None to count all of them (limit=2 checks that a puzzle has a unique solution)
+        - budget: Limits of the search (see core.budget.Budget), when it runs out the status is "unknown" and the count is only a lower bound
+
+        Returns the number of solutions found
+        """
+        count = 0
+        for _ in self.iter_solutions(budget):
+            count += 1
+            if limit is not None and count >= limit:
+                break
+        return count
+
+
+    def backtrack(self, trace_path=None):
         """
         This is the backtracking method, which will allow us to examine all the possibilities of the search tree that respect the constraints.
         It stops when the final solution has been found or when all the possibilities have been explored.
-        - assignment : the current variable assignment of the CSP
+        - trace_path: File where every decision, pruning, failure and backtrack is logged (see core.trace), None to disable the trace
 
         Returns the result if it exists, else None .
         """
-        if len(self.assignment) == len(self.game.variables):
-            return self.assignment
-
-        var = self.select_unassigned_variable()
-        for value in self.order_domain_values(var):
-            if self.is_consistent(var, value):
-                self.node_expansions += 1
-                self.assignment[var] = value
-                cond, removed_values = True, {}
-                if self.methods["fw_ck"]:
-                    cond, removed_values = self.methods["fw_ck"].apply(self, var)
-                if cond:
-                    result = self.backtrack()
-                    if result is not None:
-                        return result
-
-                # Get back every removed values
-                for k, values in removed_values.items():
-                    if k in self.domains:
-                        self.domains[k].extend([val for val in values])
-                    else:
-                        self.domains[k] = [val for val in values]
-
-                del self.assignment[var]
-                self.number_of_backtracks += 1
+        if trace_path is None:
+            return next(self.search(), None)
+        with SearchTrace(trace_path, self) as self.trace:
+            try:
+                return next(self.search(), None)
+            finally:
+                self.trace = None
+
+
+    def search(self, var=None, values=None):
+        """
+        Explores the search tree and yields every complete assignment that respects the constraints.
+        After a solution the caller can resume the generator: the last assignment is undone and the search goes on from there.
+        The search is iterative: self.frames is the explicit stack of the branch, one (variable, values left) frame per assigned variable,
+        so the depth is not limited by the recursion limit of Python and the memory only grows with depth times domain size.
+        - var: The variable to branch on, selected with the heuristics by default
+        - values: The values tried for var, ordered with the heuristics by default
+
+        Yields the current assignment each time it is complete
+        """
+        # Conflict-directed backjumping replaces the chronological search
+        if self.methods["cbj"]:
+            return (yield from self.methods["cbj"].search(self, var, values))
+        frames = self.frames
+        base = len(frames)
+        while True:
+            # Enter a new node
+            if self.work_sharing is not None:
+                self.work_sharing.poll(self)
+            if self.budget is not None:
+                self.budget.poll(self)
+            if len(self.assignment) == len(self.game.variables):
+                if self.trace is not None:
+                    self.trace.solution(self)
+                yield self.assignment
+            else:
+                if var is None:
+                    var = self.select_unassigned_variable()
+                    values = self.order_domain_values(var)
+                frames.append((var, list(values)))  # Another process can take the values left (see share_work)
+            var = None
+
+            # Try the next value of the deepest node, and go back up when a node has no value left
+            entered = False
+            while len(frames) > base:
+                node_var, remaining = frames[-1]
+                if node_var in self.assignment:
+                    # The subtree of the previous value has been explored, get back every removed values
+                    self.unassign(node_var)
+                    self.number_of_backtracks += 1
+                if not remaining:
+                    frames.pop()
+                    continue
+                value = remaining.pop(0)
+                if self.is_consistent(node_var, value):
+                    self.node_expansions += 1
+                    if self.assign(node_var, value):
+                        entered = True
+                        break
+            if not entered:
+                return
+
+
+    def assign(self, var, value):
+        """
+        Assigns a value to a variable and filters the domains with the methods. The changes can be undone with unassign
+        - var: The variable assigned
+        - value: The value given to the variable
+
+        Returns False if a domain has been emptied, else True
+        """
+        if self.trace is not None:
+            self.trace.decision(self, var, value)
+        self.assignment[var] = value
+        self.domains.mark()
+        cond = True
+        if self.methods["fw_ck"]:
+            cond = self.methods["fw_ck"].apply(self, var)
+        if cond and self.methods["mac"]:
+            cond = self.methods["mac"].apply(self, var)
+        if cond and self.methods["line"]:
+            cond = self.methods["line"].apply(self, var)
+        return cond
+
+
+    def prune(self, var, value, failure=None):
+        """
+        Removes a value from the domain of a variable (the change is written on the trail and undone with unassign)
+        - var: The variable that loses a value
+        - value: The value removed
+        - failure: The failed check (constraint, value, variable) that removed the value, kept to explain it when backjumping
+        Every method removes its values here, so they are all counted in pruned_values the same way
+        """
+        if self.trace is not None:
+            self.trace.prune(self, var, value, failure)
+        if self.domains.remove(var, value):
+            self.pruned_values += 1
+        if not self.domains.size(var):
+            self.wipeout = var
+        if self.methods["cbj"]:
+            self.methods["cbj"].explain(self, var, value, failure)
+
+
+    def unassign(self, var):
+        """
+        Removes the value of a variable and gets back every value removed since it was assigned
+        - var: The variable to unassign
+        """
+        if self.trace is not None:
+            self.trace.backtrack(self, var)
+        self.domains.undo()
+        del self.assignment[var]
+        self.domains.push(var)
+
+
+    def root_subproblem(self):
+        """
+        Filters the domains at the root (like iter_solutions) and returns the root of the search as a subproblem for the parallel search.
+        A subproblem is (partial assignment, domain masks, variable to branch on or None, values to try or None)
+        """
+        self.unwind()
+        if self.methods["cbj"]:
+            self.methods["cbj"].reset(self)
+        if self.weighting:
+            self.weighting.reset(self)
+        root_method = self.methods["ac3"] or self.methods["mac"]
+        if root_method:
+            root_method.apply(self)
+        if self.methods["line"]:
+            self.methods["line"].apply(self)
+        return (dict(self.assignment), self.domains.snapshot(), None, None)
+
+
+    def restore(self, subproblem):
+        """
+        Replaces the current assignment and domains with copies of the ones of a subproblem (the search of a worker changes them)
+        """
+        assignment, masks, _, _ = subproblem
+        self.assignment = Assignment(self.game)
+        for var, value in assignment.items():
+            self.assignment[var] = value
+        self.domains.load(masks)
+        self.frames = []
+        if self.methods["cbj"]:
+            self.methods["cbj"].reset(self)
+
+
+    def expand(self, subproblem):
+        """
+        Branches once on a subproblem. The branching works on copies of its assignment and domains,
+        the ones of the CSP are given back afterwards (it is called at the root, when no branch is assigned)
+        - subproblem: see root_subproblem
+
+        Returns the subproblems of the children and the solution if the subproblem is already complete, else None
+        """
+        assignment, masks = self.assignment, self.domains.snapshot()
+        self.restore(subproblem)
+        try:
+            _, _, var, values = subproblem
+            if len(self.assignment) == len(self.game.variables):
+                return [], dict(self.assignment)
+            if var is None:
+                var = self.select_unassigned_variable()
+                values = self.order_domain_values(var)
+            children = []
+            for value in values:
+                if self.is_consistent(var, value):
+                    self.node_expansions += 1
+                    if self.assign(var, value):
+                        children.append((dict(self.assignment), self.domains.snapshot(), None, None))
+                    self.unassign(var)
+            return children, None
+        finally:
+            self.assignment = assignment
+            self.domains.load(masks)
+
+
+    def search_subproblem(self, subproblem):
+        """
+        Explores a subproblem
+        - subproblem: see root_subproblem
+
+        Yields every solution of the subproblem
+        """
+        self.restore(subproblem)
+        _, _, var, values = subproblem
+        for solution in self.search(var, values):
+            yield dict(solution)
+
+
+    def share_work(self):
+        """
+        Takes the values left in the shallowest node of the current branch, so another process can explore them
+
+        Returns the subproblem of these values, None if there are no values left
+        """
+        for depth, (var, remaining) in enumerate(self.frames):
+            if remaining:
+                values = list(remaining)
+                remaining.clear()
+                deeper = {cell for cell, _ in self.frames[depth:]}
+                assignment = {cell: value for cell, value in self.assignment.items() if cell not in deeper}
+                return (assignment, self.domains.snapshot(depth), var, values)
         return None
 
 
@@ -90,8 +391,14 @@ class CSP:
 
         Returns the unassigned variable selectionned
         """
-        unassigned_vars = [var for var in self.game.variables if var not in self.assignment]
-        for heuristic in self.heuristics["variable"]:
+        heuristics = self.heuristics["variable"]
+        if heuristics and hasattr(heuristics[0], "candidates"):
+            # The first heuristic reads its variables from an index (like the buckets of domain sizes for MRV)
+            unassigned_vars = heuristics[0].candidates(self, first=len(heuristics) == 1)
+            heuristics = heuristics[1:]
+        else:
+            unassigned_vars = [var for var in self.game.variables if var not in self.assignment]
+        for heuristic in heuristics:
             unassigned_vars = heuristic.apply(unassigned_vars, self)
         return unassigned_vars[0]
 
@@ -119,22 +426,42 @@ class CSP:
 
         Returns True if the variable with this value respect all constraint, else False
         """
+        if self.profiler is not None:
+            return self.profiler.is_consistent(self, var, value)
+        if self.check_cache is not None:
+            return self.check_cache.is_consistent(self, var, value)
         constraints = self.constraints[var]
         for cst in constraints: # Unit constraints
             self.number_of_constraint_checks += 1
             res = cst.is_valid(value, var, self.assignment, self.game)
             if not res:
-                self.pruned_values += 1  # Increment pruned values if inconsistency is found
-                return False
+                return self.fail(cst, value, var)
         for glb_cst in self.global_constraints: #Global constraints
             self.number_of_constraint_checks += 1
             res = glb_cst(value, var, self.assignment, self.game)
             if not res:
-                self.pruned_values += 1  # Increment pruned values if inconsistency is found
-                return False
+                return self.fail(glb_cst, value, var)
         return True
 
 
+    def fail(self, cst, value, var):
+        """
+        Records a failed check: the failure is kept to explain it, the weighting heuristic learns from it and the trace logs it
+        - cst: The constraint (or global constraint) that rejected the value
+        - value: The value rejected
+        - var: The variable tested
+
+        Returns False, the result of the check
+        """
+        self.pruned_values += 1  # Increment pruned values if inconsistency is found
+        self.failure = (cst, value, var)
+        if self.weighting:
+            self.weighting.weigh(self, self.failure)
+        if self.trace is not None:
+            self.trace.failure(self, self.failure)
+        return False
+
+
     def display_performance(self):
         """
         Display the performance metrics of the CSP solver after execution.
@@ -149,11 +476,26 @@ class CSP:
         - Number of constraint checks: The total number of constraint evaluations performed during the solving process.
         - Pruned values: The total number of values removed from variable domains during constraint propagation.
         """
-        print("Time taken: {:.4f} seconds".format(self.end_time - self.start_time))
-        print("Node expansions: {}".format(self.node_expansions))
-        print("Number of Backtracks: {}".format(self.number_of_backtracks))
-        print("Number of Constraint Checks: {}".format(self.number_of_constraint_checks))
-        print("Pruned values: {}".format(self.pruned_values))
+        performance = self.performance
+        print("Time taken: {:.4f} seconds".format(performance["time"]))
+        print("Node expansions: {}".format(performance["node_expansions"]))
+        print("Number of Backtracks: {}".format(performance["number_of_backtracks"]))
+        print("Number of Constraint Checks: {}".format(performance["number_of_constraint_checks"]))
+        print("Pruned values: {}".format(performance["pruned_values"]))
+
+
+    @property
+    def performance(self):
+        """
+        Returns the performance metrics of the last execution as a dictionnary (see display_performance)
+        """
+        return {
+            "time": (self.end_time - self.start_time) if self.end_time is not None else None,
+            "node_expansions": self.node_expansions,
+            "number_of_backtracks": self.number_of_backtracks,
+            "number_of_constraint_checks": self.number_of_constraint_checks,
+            "pruned_values": self.pruned_values,
+        }
 
 
     def display_solution(self):
@@ -206,14 +548,25 @@ class CSP:
         """
         self.heuristics = {h: [] for h in self.accepted_h}
         self.methods = {m: None for m in self.accepted_m}
+        self.weighting = None
+        self.dom_wdeg = None
+        self.domains.wdeg = None
+        self.ac3_residues = {}
+        self.backjumping = None
         self.reset_metrics
-        self.domains = copy.deepcopy(self.initial_domain)
-        self.assignment = {}
+        self.domains.reset()
+        self.assignment = Assignment(self.game)
+        self.frames = []
 
     def add_heuristics(self, heuristics):
         for h in heuristics:
             if h.get_type() in self.heuristics:
+                if self.profiler is not None:
+                    h = self.profiler.wrap(h, "heuristic")
                 self.heuristics[h.get_type()].append(h)
+                # The heuristic learns from the failures of the search
+                if hasattr(h, "weigh"):
+                    self.weighting = h
             else:
                 raise ValueError(f"Type {h.get_type()} : is not accepted [in heuristic : {h.__name__}]")
             
@@ -221,6 +574,6 @@ class CSP:
     def add_methods(self, methods):
         for h in methods:
             if h.get_type() in self.methods:
-                self.methods[h.get_type()] = h
+                self.methods[h.get_type()] = self.profiler.wrap(h, "method") if self.profiler is not None else h
             else:
                 raise ValueError(f"Type {h.get_type()} : is not accepted [in methods : {h.__name__}]")
\ No newline at end of file
@@ -0,0 +1,286 @@
+import heapq
+
+
+class DomainStore:
+    """This class stores the domains of every variable of the CSP as small bitmasks in a flat list (bit i set when the value i is possible).
+    Every change is written on a trail with the previous mask, so the domains can be restored to a level mark
+    by popping the trail, without copying them or building dictionnaries of removed values.
+
+    The variables can also be bucketed by domain size (see smallest), so MRV doesn't have to go through every variable.
+    The support counts of the values (see core.supports), when they are attached, are updated with every change of mask.
+    Each bucket is a heap of variable indices, a change of domain pushes the variable in its new bucket and the entries
+    that are not true anymore (another size, or an assigned variable) are dropped when they reach the top of their heap.
+    When a weighted degree is given to every variable (see heuristics.variable.DomWdeg), the dom/wdeg scores are kept
+    the same way in one heap of (domain size / weighted degree, variable index), see best_scores. A failure changes the weight
+    of many variables at once, so the changed variables are only collected in a set and pushed once at the next selection.
+    """
+
+    def __init__(self, domains):
+        self.variables = list(domains)
+        self.index = {var: i for i, var in enumerate(self.variables)}
+        self.initial_masks = [sum(1 << value for value in values) for values in domains.values()]
+        self.masks = list(self.initial_masks)
+        self.trail = []  # (variable index, previous mask) for each change
+        self.levels = []  # Size of the trail at each mark
+
+        # Values and size of every possible mask, so reading a domain is a lookup
+        max_value = max((max(values) for values in domains.values() if values), default=0)
+        self.value_lists = [tuple(v for v in range(max_value + 1) if mask >> v & 1) for mask in range(1 << (max_value + 1))]
+        self.sizes = [len(values) for values in self.value_lists]
+        self.buckets = None  # Heaps of variable indices for each domain size, built by the first call to smallest
+        self.pushes = 0  # Number of entries pushed since the buckets were built
+        self.supports = None  # Support counts of every (variable, value) pair, attached by SupportCounts
+        self.wdeg = None  # Weighted degree of every variable, attached by DomWdeg
+        self.scores = None  # Heap of the dom/wdeg score of every variable, built by the first call to best_scores
+        self.rescored = set()  # Indices of the variables whose score has changed since the last call to best_scores
+        self.score_pushes = 0  # Number of entries pushed since the heap of scores was built
+
+
+    def __getitem__(self, var):
+        """
+        Returns the values of the domain of a variable as a tuple
+        - var: The variable of the CSP
+        """
+        return self.value_lists[self.masks[self.index[var]]]
+
+
+    def __contains__(self, var):
+        return var in self.index
+
+
+    def __len__(self):
+        return len(self.variables)
+
+
+    def size(self, var):
+        """
+        Returns the number of values left in the domain of a variable
+        - var: The variable of the CSP
+        """
+        return self.sizes[self.masks[self.index[var]]]
+
+
+    def contains(self, var, value):
+        """
+        Returns True if the value is still in the domain of the variable, else False
+        - var: The variable of the CSP
+        - value: The value we are looking for
+        """
+        return self.masks[self.index[var]] >> value & 1 == 1
+
+
+    def remove(self, var, value):
+        """
+        Removes a value from the domain of a variable and writes the change on the trail
+        - var: The variable of the CSP
+        - value: The value to remove
+
+        Returns True if the value was in the domain, else False
+        """
+        i = self.index[var]
+        mask = self.masks[i]
+        if not mask >> value & 1:
+            return False
+        # Changes made before the first mark are never undone, there is no need to keep them
+        if self.levels:
+            self.trail.append((i, mask))
+        self.masks[i] = mask & ~(1 << value)
+        if self.buckets is not None:
+            self.bucket(i)
+        if self.scores is not None:
+            self.rescored.add(i)
+        if self.supports is not None:
+            self.supports.update(i, mask, self.masks[i])
+        return True
+
+
+    def mark(self):
+        """
+        Starts a new level, the changes made from now can be undone together with undo()
+        """
+        self.levels.append(len(self.trail))
+
+
+    def undo(self):
+        """
+        Restores every domain as it was at the last mark and removes this mark
+        """
+        level = self.levels.pop()
+        trail, masks = self.trail, self.masks
+        while len(trail) > level:
+            i, mask = trail.pop()
+            if self.supports is not None:
+                self.supports.update(i, masks[i], mask)
+            masks[i] = mask
+            if self.buckets is not None:
+                self.bucket(i)
+            if self.scores is not None:
+                self.rescored.add(i)
+
+
+    def snapshot(self, level=None):
+        """
+        Returns a copy of the masks of every domain
+        - level: Index of a mark, the masks are given as they were when this mark was set (the current masks by default)
+        """
+        masks = list(self.masks)
+        if level is not None and level < len(self.levels):
+            for i, mask in reversed(self.trail[self.levels[level]:]):
+                masks[i] = mask
+        return masks
+
+
+    def load(self, masks):
+        """
+        Replaces every domain with masks given by snapshot and forgets every mark
+        """
+        self.masks = list(masks)
+        self.trail = []
+        self.levels = []
+        self.buckets = None
+        self.scores = None
+        if self.supports is not None:
+            self.supports.build()
+
+
+    def reset(self):
+        """
+        Restores every domain to its initial values and forgets every mark
+        """
+        self.masks = list(self.initial_masks)
+        self.trail = []
+        self.levels = []
+        self.buckets = None
+        self.scores = None
+        if self.supports is not None:
+            self.supports.build()
+
+
+    def items(self):
+        """
+        Returns the (variable, values) pairs of every domain
+        """
+        return [(var, self.value_lists[mask]) for var, mask in zip(self.variables, self.masks)]
+
+
+    def bucket(self, i):
+        """
+        Pushes a variable in the bucket of its domain size, the buckets are built again when most of their entries are outdated
+        - i: Index of the variable
+        """
+        heapq.heappush(self.buckets[self.sizes[self.masks[i]]], i)
+        self.pushes += 1
+        if self.pushes > 4 * len(self.masks):
+            self.build_buckets()
+
+
+    def build_buckets(self):
+        """
+        Builds the buckets of every variable from the current domains
+        """
+        self.buckets = [[] for _ in range(max(self.sizes) + 1)]
+        for i, mask in enumerate(self.masks):
+            self.buckets[self.sizes[mask]].append(i)  # The indices are increasing, each list is already a heap
+        self.pushes = 0
+
+
+    def push(self, var):
+        """
+        Puts a variable back in its bucket and in the heap of scores, to be called when it has been unassigned
+        (smallest and best_scores drop the assigned variables)
+        - var: The variable of the CSP
+        """
+        if self.buckets is not None:
+            self.bucket(self.index[var])
+        if self.scores is not None:
+            self.rescored.add(self.index[var])
+
+
+    def smallest(self, assignment, first=False):
+        """
+        Finds the unassigned variables with the fewest values left (MRV) in the buckets
+        - assignment: The current assignment, its variables are skipped
+        - first: True to only get the first variable (in the order of the variables), then a selection costs O(1) amortized
+
+        Returns the list of the unassigned variables with the smallest domain size, in the order of the variables
+        """
+        if self.buckets is None:
+            self.build_buckets()
+        variables, masks, sizes = self.variables, self.masks, self.sizes
+        for size, heap in enumerate(self.buckets):
+            # Drops the outdated entries on top of the heap
+            while heap and (sizes[masks[heap[0]]] != size or variables[heap[0]] in assignment):
+                heapq.heappop(heap)
+            if heap:
+                if first:
+                    return [variables[heap[0]]]
+                return [variables[i] for i in sorted(set(heap)) if sizes[masks[i]] == size and variables[i] not in assignment]
+        return []
+
+
+    def weigh(self, indices):
+        """
+        Adds 1 to the weighted degree of some variables, their scores are updated at the next call to best_scores
+        - indices: Indices of the variables
+        """
+        wdeg = self.wdeg
+        for i in indices:
+            wdeg[i] += 1
+        if self.scores is not None:
+            self.rescored.update(indices)
+
+
+    def build_scores(self):
+        """
+        Builds the heap of scores of every variable from the current domains and weighted degrees
+        """
+        sizes, wdeg = self.sizes, self.wdeg
+        self.scores = [(sizes[mask] / wdeg[i], i) for i, mask in enumerate(self.masks)]
+        heapq.heapify(self.scores)
+        self.rescored = set()
+        self.score_pushes = 0
+
+
+    def best_scores(self, assignment, first=False):
+        """
+        Finds the unassigned variables with the smallest dom/wdeg score in the heap of scores, wdeg must be attached
+        - assignment: The current assignment, its variables are skipped
+        - first: True to only get the first variable (in the order of the variables)
+
+        Returns the list of the unassigned variables with the smallest score, in the order of the variables
+        """
+        if self.scores is None:
+            self.build_scores()
+        elif self.rescored:
+            # The variables whose score has changed are pushed with their new score,
+            # the heap is built again when most of its entries are outdated
+            self.score_pushes += len(self.rescored)
+            if self.score_pushes > 4 * len(self.masks):
+                self.build_scores()
+            else:
+                sizes, masks, wdeg = self.sizes, self.masks, self.wdeg
+                for i in self.rescored:
+                    heapq.heappush(self.scores, (sizes[masks[i]] / wdeg[i], i))
+                self.rescored.clear()
+        heap, variables, masks, sizes, wdeg = self.scores, self.variables, self.masks, self.sizes, self.wdeg
+        # Drops the outdated entries on top of the heap
+        while heap and (sizes[masks[heap[0][1]]] / wdeg[heap[0][1]] != heap[0][0] or variables[heap[0][1]] in assignment):
+            heapq.heappop(heap)
+        if not heap:
+            return []
+        if first:
+            # The entries are ordered by score then by index, the top is the first variable of the best score
+            return [variables[heap[0][1]]]
+        best = heap[0][0]
+        # The entries with the best score are a subtree at the top of the heap, only its nodes are visited
+        found = set()
+        stack = [0]
+        while stack:
+            k = stack.pop()
+            score, i = heap[k]
+            if score != best:
+                continue
+            if sizes[masks[i]] / wdeg[i] == score and variables[i] not in assignment:
+                found.add(i)
+            stack.extend(child for child in (2 * k + 1, 2 * k + 2) if child < len(heap))
+        return [variables[i] for i in sorted(found)]
@@ -0,0 +1,103 @@
+import os
+import numpy as np
+
+class ConstraintNetwork:
+    """This class compiles the constraints of a CSP once into an index of the neighbours of each variable
+    (the cells involved in its constraints), so methods and heuristics don't have to rebuild them on every call.
+
+    The neighbours are stored in a CSR layout: the neighbours of the variable i are indices[indptr[i]:indptr[i + 1]].
+    The part that only depends on the shape of the board can be saved and reused for every board of the same shape.
+    """
+
+    def __init__(self, variables, constraints, shape, base=None):
+        """
+        - variables: The variables of the CSP
+        - constraints: The constraints of each variable
+        - shape: The shape of the board
+        - base: A network loaded for the same shape (and the same order of variables), its shape neighbours are reused instead of being compiled again
+        """
+        self.variables = list(variables)
+        self.index = {var: i for i, var in enumerate(self.variables)}
+        self.shape = tuple(shape)
+        if base is not None and base.shape != self.shape:
+            raise ValueError(f"Network of shape {base.shape} can't be used for a board of shape {self.shape}")
+
+        # Neighbours that only depend on the shape, then the ones added by the hints
+        if base is not None:
+            self.shape_indptr, self.shape_indices = base.shape_indptr, base.shape_indices
+        else:
+            self.shape_indptr, self.shape_indices = self.compile([
+                [cell for constraint in constraints[var] if constraint.shape_only for cell in constraint.involved_cells]
+                for var in self.variables
+            ])
+        neighbors = []
+        for i, var in enumerate(self.variables):
+            cells = [self.variables[j] for j in self.shape_indices[self.shape_indptr[i]:self.shape_indptr[i + 1]]]
+            cells += [cell for constraint in constraints[var] if not constraint.shape_only for cell in constraint.involved_cells]
+            neighbors.append(cells)
+        self.indptr, self.indices = self.compile(neighbors)
+
+        # Python lists of cells, read by methods and heuristics
+        self.neighbor_lists = [[self.variables[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]]] for i in range(len(self.variables))]
+        self.arcs = [(var, cell) for var, cells in zip(self.variables, self.neighbor_lists) for cell in cells]
+
+
+    def compile(self, neighbors):
+        """
+        Builds the CSR arrays of a list of neighbour cells for each variable (without duplicates)
+        - neighbors: The list of neighbour cells of each variable
+
+        Returns the indptr and indices arrays
+        """
+        indptr = np.zeros(len(self.variables) + 1, dtype=np.int32)
+        indices = []
+        for i, cells in enumerate(neighbors):
+            unique = sorted(set(self.index[cell] for cell in cells))
+            indices.extend(unique)
+            indptr[i + 1] = indptr[i] + len(unique)
+        return indptr, np.array(indices, dtype=np.int32)
+
+
+    def neighbors(self, var):
+        """
+        Returns the cells involved in the constraints of a variable
+        - var: The variable of the CSP
+        """
+        return self.neighbor_lists[self.index[var]]
+
+
+    def degree(self, var):
+        """
+        Returns the number of cells involved in the constraints of a variable
+        - var: The variable of the CSP
+        """
+        i = self.index[var]
+        return int(self.indptr[i + 1] - self.indptr[i])
+
+
+    def save(self, path):
+        """
+        Saves the part of the network that only depends on the shape of the board
+        - path: Path of the .npz file
+        """
+        np.savez(path, shape=np.array(self.shape), indptr=self.shape_indptr, indices=self.shape_indices)
+
+
+    @staticmethod
+    def load(path, variables, constraints, shape):
+        """
+        Builds the network of a board by reusing the shape part saved for another board of the same shape
+        - path: Path of the .npz file
+        - variables: The variables of the CSP
+        - constraints: The constraints of each variable
+        - shape: The shape of the board
+
+        Returns the network of the board
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Network file {path} not found")
+        with np.load(path) as data:
+            base = ConstraintNetwork.__new__(ConstraintNetwork)
+            base.shape = tuple(int(x) for x in data["shape"])
+            base.shape_indptr, base.shape_indices = data["indptr"], data["indices"]
+        return ConstraintNetwork(variables, constraints, shape, base=base)
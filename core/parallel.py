@@ -0,0 +1,212 @@
+import os
+import time
+import queue
+import traceback
+import multiprocessing
+from collections import deque
+
+# Counters of the workers added to the ones of the CSP
+metrics = ["node_expansions", "number_of_backtracks", "number_of_constraint_checks", "pruned_values"]
+
+
+class SearchCancelled(Exception):
+    """Raised in a worker when another worker has found a solution"""
+
+
+class WorkSharing:
+    """This class links the search of a worker process to the other workers.
+    The search calls poll at each node: every interval nodes, it stops if a solution has been found elsewhere,
+    and gives the values left in its shallowest node to the idle workers (work stealing).
+    """
+
+    def __init__(self, tasks, outstanding, idle, shared, stop, interval=32):
+        """
+        - tasks: Queue of the subproblems left to explore
+        - outstanding: Shared number of subproblems not explored yet (in the queue or being explored)
+        - idle: Shared number of workers waiting for a subproblem
+        - shared: Shared number of subproblems given to the idle workers that none of them has taken yet (it uses the lock of idle)
+        - stop: Event set when the search is over
+        - interval: Number of nodes between two checks
+        """
+        self.tasks = tasks
+        self.outstanding = outstanding
+        self.idle = idle
+        self.shared = shared
+        self.stop = stop
+        self.interval = interval
+        self.calls = 0
+
+
+    def poll(self, csp):
+        """
+        Called by the search of the CSP at each node
+        - csp: The CSP of the worker (it must implement share_work)
+        """
+        self.calls += 1
+        if self.calls % self.interval:
+            return
+        if self.stop.is_set():
+            raise SearchCancelled()
+        if self.idle.value > self.shared.value:
+            # Only the idle workers that no subproblem is waiting for get one
+            with self.idle.get_lock():
+                if self.idle.value <= self.shared.value:
+                    return
+                self.shared.value += 1
+            subproblem = csp.share_work()
+            if subproblem is None:
+                with self.idle.get_lock():
+                    self.shared.value -= 1
+                return
+            # Counted before it is queued, so the number of subproblems left can't reach 0 while it is waiting
+            with self.outstanding.get_lock():
+                self.outstanding.value += 1
+            self.tasks.put(subproblem)
+
+
+def worker(csp, tasks, results, outstanding, idle, shared, stop):
+    """
+    Explores subproblems until a solution is found or every subproblem has been explored
+    - csp: A copy of the CSP, its metrics are sent back at the end
+    - tasks: Queue of the subproblems left to explore
+    - results: Queue of the messages to the main process ("solution", "exhausted", "error" with the traceback, and "metrics")
+    The other parameters are the shared state of WorkSharing.
+    """
+    tasks.cancel_join_thread()
+    try:
+        csp.reset_metrics
+        csp.work_sharing = WorkSharing(tasks, outstanding, idle, shared, stop)
+        waiting = False  # True while this worker is counted in idle
+        while not stop.is_set():
+            try:
+                subproblem = tasks.get(timeout=0.05)
+            except queue.Empty:
+                # Ask the busy workers to share their work, once until a subproblem is taken
+                if not waiting:
+                    with idle.get_lock():
+                        idle.value += 1
+                    waiting = True
+                continue
+            if waiting:
+                with idle.get_lock():
+                    idle.value -= 1
+                    shared.value = max(shared.value - 1, 0)
+                waiting = False
+            try:
+                solution = next(csp.search_subproblem(subproblem), None)
+            except SearchCancelled:
+                break
+            if solution is not None:
+                results.put(("solution", solution))
+                stop.set()
+                break
+            with outstanding.get_lock():
+                outstanding.value -= 1
+                exhausted = outstanding.value == 0
+            if exhausted:
+                results.put(("exhausted", None))
+                stop.set()
+    except Exception:
+        # The main process raises it again, the other workers are stopped
+        results.put(("error", traceback.format_exc()))
+        stop.set()
+        return
+    results.put(("metrics", {metric: getattr(csp, metric) for metric in metrics}))
+
+
+def solve_parallel(csp, workers=None, split_factor=8, budget=None):
+    """
+    Solves a CSP with several processes. The search tree is split near the root (breadth first) into subproblems,
+    a partial assignment with its reduced domains, and the workers take them from a shared queue.
+    A worker without subproblem asks the others to share the values left in their shallowest node.
+    The first solution found stops every worker, and their metrics are added to the ones of the CSP.
+    - csp: The CSP to solve (it must implement root_subproblem, expand, search_subproblem and share_work)
+    - workers: Number of processes, the number of cores by default
+    - split_factor: Number of subproblems created for each worker before the processes are started
+    - budget: Limits of the search (see core.budget.Budget). They are checked by the main process, so the node and backtrack limits
+      only count the nodes expanded before the processes are started, the time and the cancellation stop every worker
+      (the progress is not reported)
+
+    Returns the solution if it exists, else None (csp.status tells if there is no solution or if the budget ran out).
+    An exception raised in a worker (or a worker that dies) stops every worker and raises a RuntimeError with its traceback.
+    """
+    workers = workers or os.cpu_count()
+    csp.start_time = time.time()
+    csp.end_time = None
+    csp.budget = None  # The workers are not limited, the main process stops them
+    csp.stop_reason = None
+    if budget is not None:
+        budget.start(csp)
+    root = csp.root_subproblem()
+    frontier = deque([root] if root is not None else [])
+    solution = None
+    while frontier and len(frontier) < workers * split_factor:
+        if budget is not None:
+            csp.stop_reason = budget.exceeded(csp)
+            if csp.stop_reason is not None:
+                frontier.clear()
+                break
+        children, solution = csp.expand(frontier.popleft())
+        if solution is not None:
+            break
+        frontier.extend(children)
+
+    if solution is None and frontier:
+        tasks, results = multiprocessing.Queue(), multiprocessing.Queue()
+        outstanding = multiprocessing.Value("i", len(frontier))
+        idle = multiprocessing.Value("i", 0)
+        shared = multiprocessing.Value("i", 0, lock=idle.get_lock())
+        stop = multiprocessing.Event()
+        for subproblem in frontier:
+            tasks.put(subproblem)
+        tasks.cancel_join_thread()
+        processes = [
+            multiprocessing.Process(target=worker, args=(csp, tasks, results, outstanding, idle, shared, stop), daemon=True)
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        finished = 0
+        error = None
+        exited = False  # Every process had exited at the last poll, the messages they sent before have been read since
+        while finished < workers:
+            try:
+                kind, data = results.get(timeout=0.05)
+            except queue.Empty:
+                # A worker killed before sending its metrics would leave the others waiting for its subproblem
+                crashed = next((process for process in processes if process.exitcode not in (None, 0)), None)
+                if crashed is not None and error is None:
+                    error = f"A worker process exited with code {crashed.exitcode}"
+                    stop.set()
+                if not any(process.is_alive() for process in processes):
+                    if exited:
+                        break
+                    exited = True
+                if budget is not None and not stop.is_set():
+                    csp.stop_reason = budget.exceeded(csp)
+                    if csp.stop_reason is not None:
+                        stop.set()
+                continue
+            if kind == "solution" and solution is None:
+                solution = data
+            elif kind == "error":
+                finished += 1
+                if error is None:
+                    error = data
+            elif kind == "metrics":
+                finished += 1
+                for metric in metrics:
+                    setattr(csp, metric, getattr(csp, metric) + data[metric])
+        for process in processes:
+            process.join()
+        if error is not None:
+            csp.end_time = time.time()
+            raise RuntimeError(f"The parallel search failed in a worker process:\n{error}")
+
+    csp.solution = solution
+    if solution is not None:
+        csp.status = "solved"
+    else:
+        csp.status = "unknown" if csp.stop_reason is not None else "unsolvable"
+    csp.end_time = time.time()
+    return solution
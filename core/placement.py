@@ -0,0 +1,225 @@
+import time
+import numpy as np
+
+from core.csp import CSP
+
+class PlacementCSP(CSP):
+    """This class solves the same problem as CSP with another formulation: each boat of the fleet is a variable,
+    and its domain is every legal placement (row, col, orientation) of a boat of its size on the board.
+    The placements are precomputed once as NumPy arrays of the indexes of their cells (and of the cells around them),
+    so the search reasons about whole boats and every check is an array operation over all the placements at once.
+
+    Boats of the same size are interchangeable, so they are placed in increasing placement order (symmetry breaking).
+    The search is not split between processes, solve only takes one worker, and it is not logged in a search trace.
+    """
+
+    parallel = False
+    traced = False
+
+    # Codes of the signs drawn by a placement, "0" means no hint
+    signs = {"0": 0, "S": 1, "M": 2, "<": 3, ">": 4, "^": 5, "v": 6}
+
+    def __init__(self, game, domains, constraints, global_constraints, format_solution, network=None):
+        super().__init__(game, domains, constraints, global_constraints, format_solution, network)
+        rows, cols = game.get_shape
+        self.row_counts = np.array(game.rows)
+        self.col_counts = np.array(game.cols)
+
+        # A cell of the board can hold a boat size if it is still in its domain
+        allowed = np.zeros((game.max_boat_size + 1, rows * cols), dtype=bool)
+        for (x, y), values in domains.items():
+            allowed[values, x * cols + y] = True
+        hints = np.vectorize(lambda sign: self.signs.get(sign, 0))(game.board).reshape(-1)
+        # The padding index rows * cols of the cells around a boat is never a hint
+        padded_hints = np.append(hints, 0)
+
+        # Placements of each size: cells of the boat, cells around it (that must be water) and the sign of each cell
+        self.placements = {}
+        for size in game.boats:
+            cells, around, signs, positions = self.build_placements(size, rows, cols)
+            valid = allowed[size][cells].all(axis=1)
+            # The hints covered by a boat must be drawn by the boat, and no hint can be around a boat
+            valid &= ~((hints[cells] > 0) & (signs != hints[cells])).any(axis=1)
+            valid &= ~(padded_hints[around] > 0).any(axis=1)
+            # A boat can't have more cells in a row or a column than its count
+            cell_rows, cell_cols = cells // cols, cells % cols
+            in_row = np.array([size if orientation == "h" else 1 for _, _, orientation in positions], dtype=int)
+            in_col = np.array([size if orientation == "v" else 1 for _, _, orientation in positions], dtype=int)
+            valid &= (in_row[:, None] <= self.row_counts[cell_rows]).all(axis=1)
+            valid &= (in_col[:, None] <= self.col_counts[cell_cols]).all(axis=1)
+            self.pruned_values += int((~valid).sum())
+            self.placements[size] = {
+                "cells": cells[valid],
+                "around": around[valid],
+                "cell_rows": cell_rows[valid],
+                "cell_cols": cell_cols[valid],
+                "in_row": in_row[valid],
+                "in_col": in_col[valid],
+                "positions": [p for p, v in zip(positions, valid) if v],
+            }
+        self.hints = hints > 0
+
+
+    @staticmethod
+    def build_placements(size, rows, cols):
+        """
+        Builds every placement of a boat on an empty board, the cells are given by their index x * cols + y
+        (the masks of the whole board would take placements * rows * cols booleans for each size)
+        - size: The size of the boat
+        - rows: Rows number of the board
+        - cols: Cols number of the board
+
+        Returns the indexes of the boat cells (placements * size), the indexes of the cells around the boat
+        (padded with rows * cols, outside the board), the signs drawn on the boat cells and the (row, col, orientation) of each placement
+        """
+        positions = [(x, y, "h") for x in range(rows) for y in range(cols - size + 1)]
+        if size > 1:
+            positions += [(x, y, "v") for x in range(rows - size + 1) for y in range(cols)]
+        origins = np.array([(x, y) for x, y, _ in positions], dtype=int).reshape(-1, 2)
+        vertical = np.array([orientation == "v" for _, _, orientation in positions], dtype=bool)
+        steps = np.arange(size)
+        xs = origins[:, :1] + np.where(vertical[:, None], steps, 0)
+        ys = origins[:, 1:] + np.where(vertical[:, None], 0, steps)
+        cells = xs * cols + ys
+        if size == 1:
+            signs = np.full((len(positions), 1), PlacementCSP.signs["S"], dtype=np.int8)
+        else:
+            first, last = np.where(vertical, PlacementCSP.signs["^"], PlacementCSP.signs["<"]), np.where(vertical, PlacementCSP.signs["v"], PlacementCSP.signs[">"])
+            signs = np.full((len(positions), size), PlacementCSP.signs["M"], dtype=np.int8)
+            signs[:, 0], signs[:, -1] = first, last
+
+        # The cells around a boat are the cells of the rectangle of 3 * (size + 2) cells centered on it, without its own cells
+        dx, dy = np.meshgrid(np.arange(-1, size + 1), np.arange(-1, 2), indexing="ij")
+        dx, dy = dx.reshape(-1), dy.reshape(-1)
+        inside = (dx >= 0) & (dx < size) & (dy == 0)
+        dx, dy = dx[~inside], dy[~inside]
+        around_x = origins[:, :1] + np.where(vertical[:, None], dx, dy)
+        around_y = origins[:, 1:] + np.where(vertical[:, None], dy, dx)
+        on_board = (around_x >= 0) & (around_x < rows) & (around_y >= 0) & (around_y < cols)
+        around = np.sort(np.where(on_board, around_x * cols + around_y, rows * cols), axis=1)
+        return cells, around, signs, positions
+
+
+    def stream(self):
+        """
+        Streams the solutions one at a time for iter_solutions by placing whole boats, the search is suspended after each solution
+        and resumed from the same node.
+
+        Yields each solution as a dictionnary {cell: value}
+        """
+        self.start_time = time.time()
+        self.end_time = None
+        rows, cols = self.game.get_shape
+        state = {
+            "occupied": np.zeros(rows * cols, dtype=bool),
+            "blocked": np.zeros(rows * cols + 1, dtype=bool),  # The last cell is the padding of the cells around the boats
+            "rows": np.zeros(rows, dtype=int),
+            "cols": np.zeros(cols, dtype=int),
+        }
+        remaining = dict(self.game.boats)
+        last = {size: -1 for size in remaining}  # Index of the last placement used for each size
+        for found in self.search(state, remaining, last):
+            self.end_time = time.time()
+            yield self.to_assignment(found)
+        self.end_time = time.time()
+
+
+    def valid_placements(self, size, state, start):
+        """
+        Finds the placements of a size that are still possible
+        - size: The boat size
+        - state: The current board state (occupied and blocked cells, row and column counts)
+        - start: Only placements after this index are kept (symmetry breaking)
+
+        Returns the indexes of the possible placements
+        """
+        placement = self.placements[size]
+        self.number_of_constraint_checks += len(placement["positions"])
+        valid = ~state["blocked"][placement["cells"]].any(axis=1)
+        cell_rows, cell_cols = placement["cell_rows"], placement["cell_cols"]
+        valid &= (state["rows"][cell_rows] + placement["in_row"][:, None] <= self.row_counts[cell_rows]).all(axis=1)
+        valid &= (state["cols"][cell_cols] + placement["in_col"][:, None] <= self.col_counts[cell_cols]).all(axis=1)
+        valid[:start + 1] = False
+        return np.flatnonzero(valid)
+
+
+    def backtrack(self, state, remaining, last):
+        """
+        This is the backtracking method, each level places one boat.
+        - state: The current board state (occupied and blocked cells, row and column counts)
+        - remaining: The number of boats left to place for each size
+        - last: The index of the last placement used for each size
+
+        Returns the occupied cells for each size of the solution if it exists, else None .
+        """
+        return next(self.search(state, remaining, last), None)
+
+
+    def search(self, state, remaining, last):
+        """
+        Explores the search tree, each level places one boat (see backtrack for the parameters)
+
+        Yields the occupied cells for each size of every solution
+        """
+        if self.budget is not None:
+            # The depth is the number of boats placed
+            self.budget.poll(self, int(sum(self.game.boats.values()) - sum(remaining.values())))
+        if not any(remaining.values()):
+            solved = (state["rows"] == self.row_counts).all() and (state["cols"] == self.col_counts).all()
+            if solved and not (self.hints & ~state["occupied"]).any():
+                yield {}
+            return
+
+        # Find the placements left for every size, and the cells they can still cover
+        candidates = {}
+        coverable = np.zeros_like(state["occupied"])
+        for size, nb in remaining.items():
+            if nb:
+                candidates[size] = self.valid_placements(size, state, last[size])
+                if len(candidates[size]) < nb:
+                    self.pruned_values += 1
+                    return
+                coverable[self.placements[size]["cells"][candidates[size]]] = True
+        # Every hint must be covered and every row and column must still be able to reach its count
+        rows, cols = self.game.get_shape
+        coverable &= ~state["occupied"]
+        if (self.hints & ~state["occupied"] & ~coverable).any():
+            return
+        coverable = coverable.reshape(rows, cols)
+        if (state["rows"] + coverable.sum(axis=1) < self.row_counts).any() or (state["cols"] + coverable.sum(axis=0) < self.col_counts).any():
+            return
+
+        # Place the size with the fewest placements left per boat
+        size = min(candidates, key=lambda s: (len(candidates[s]) / remaining[s], -s))
+        placement = self.placements[size]
+        previous = last[size]
+        remaining[size] -= 1
+        for k in candidates[size]:
+            self.node_expansions += 1
+            child = {key: value.copy() for key, value in state.items()}
+            child["occupied"][placement["cells"][k]] = True
+            child["blocked"][placement["cells"][k]] = True
+            child["blocked"][placement["around"][k]] = True
+            np.add.at(child["rows"], placement["cell_rows"][k], 1)
+            np.add.at(child["cols"], placement["cell_cols"][k], 1)
+            last[size] = k
+            for result in self.search(child, remaining, last):
+                yield {**result, size: result.get(size, []) + [placement["cells"][k]]}
+            self.number_of_backtracks += 1
+        remaining[size] += 1
+        last[size] = previous
+
+
+    def to_assignment(self, found):
+        """
+        Converts the boats placed to the assignment format used by CSP
+        - found: The indexes of the cells of the boats placed for each size
+
+        Returns a dictionnary {cell: value}
+        """
+        rows, cols = self.game.get_shape
+        board = np.zeros(rows * cols, dtype=int)
+        for size, masks in found.items():
+            for mask in masks:
+                board[mask] = size
+        return {(x, y): int(board[x * cols + y]) for x, y in self.game.variables}
@@ -0,0 +1,177 @@
+import json
+import time
+
+
+class Probe:
+    """This class stands for a method or a heuristic while a CSP is profiled: its entry points are timed,
+    every other attribute is read from the class itself (so the CSP uses it like the class).
+    """
+
+    timed = ("apply", "candidates")
+
+    def __init__(self, component, kind, profiler):
+        """
+        - component: The method or heuristic class
+        - kind: "method" or "heuristic"
+        - profiler: The Profiler that records the calls
+        """
+        self.component = component
+        self.kind = kind
+        self.profiler = profiler
+
+
+    def __getattr__(self, name):
+        attribute = getattr(self.component, name)
+        if name not in self.timed:
+            return attribute
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = attribute(*args, **kwargs)
+            # A method fails when it empties a domain
+            self.profiler.record(self.kind, self.component.__name__, start, result is False, name)
+            return result
+        return timed
+
+
+class Profiler:
+    """This class records the calls, the failures and the cumulative time of each constraint class, global constraint,
+    method and heuristic of a CSP (csp engine only, the bitboard and placement engines don't use them).
+    It is attached to a CSP with attach: the constraints are then checked by Profiler.is_consistent and the methods and heuristics
+    are replaced with probes. A CSP without profiler only pays one test in is_consistent.
+
+    The calls of the methods and heuristics are also kept as events (up to max_events), exported in the Chrome trace-event format
+    (chrome://tracing or Perfetto). The constraint checks are too many to be events, they are only counted.
+    """
+
+    def __init__(self, max_events=100000):
+        """
+        - max_events: Maximum number of method and heuristic calls kept for the trace
+        """
+        self.max_events = max_events
+        self.stats = {}  # (kind, name): [calls, failures, time]
+        self.events = []
+        self.start_time = time.perf_counter()
+        self.metrics = None
+
+
+    def attach(self, csp):
+        """
+        Starts profiling a CSP: its methods and heuristics are replaced with probes (the ones added later too, see CSP.add_methods)
+        """
+        csp.profiler = self
+        for h_type, heuristics in csp.heuristics.items():
+            csp.heuristics[h_type] = [self.wrap(h, "heuristic") for h in heuristics]
+        for m_type, method in csp.methods.items():
+            if method is not None:
+                csp.methods[m_type] = self.wrap(method, "method")
+        if csp.weighting is not None:
+            csp.weighting = self.wrap(csp.weighting, "heuristic")
+
+
+    def detach(self, csp):
+        """
+        Stops profiling a CSP and gives it back its methods and heuristics, the metrics of the CSP are kept with the results
+        """
+        csp.profiler = None
+        for h_type, heuristics in csp.heuristics.items():
+            csp.heuristics[h_type] = [self.unwrap(h) for h in heuristics]
+        for m_type, method in csp.methods.items():
+            csp.methods[m_type] = self.unwrap(method)
+        csp.weighting = self.unwrap(csp.weighting)
+        self.metrics = csp.performance
+
+
+    def wrap(self, component, kind):
+        """
+        Returns the probe of a method or a heuristic (the component itself if it is already one)
+        """
+        return component if isinstance(component, Probe) else Probe(component, kind, self)
+
+
+    @staticmethod
+    def unwrap(component):
+        """
+        Returns the method or heuristic of a probe
+        """
+        return component.component if isinstance(component, Probe) else component
+
+
+    def record(self, kind, name, start, failed, entry=None):
+        """
+        Adds a call to the statistics of a component
+        - kind: "constraint", "global", "method" or "heuristic"
+        - name: Name of the class or the function
+        - start: perf_counter when the call started
+        - failed: True if the call failed (constraint not respected, or domain emptied by a method)
+        - entry: Name of the function called, the call is kept as an event of the trace when it is given
+        """
+        end = time.perf_counter()
+        stats = self.stats.get((kind, name))
+        if stats is None:
+            stats = self.stats[(kind, name)] = [0, 0, 0.0]
+        stats[0] += 1
+        stats[1] += failed
+        stats[2] += end - start
+        if entry is not None and len(self.events) < self.max_events:
+            self.events.append((f"{name}.{entry}", kind, start, end))
+
+
+    def is_consistent(self, csp, var, value):
+        """
+        Checks the constraints of a value like CSP.is_consistent, and records each check
+        """
+        for cst in csp.constraints[var]:
+            csp.number_of_constraint_checks += 1
+            start = time.perf_counter()
+            res = cst.is_valid(value, var, csp.assignment, csp.game)
+            self.record("constraint", type(cst).__name__, start, not res)
+            if not res:
+                return csp.fail(cst, value, var)
+        for glb_cst in csp.global_constraints:
+            csp.number_of_constraint_checks += 1
+            start = time.perf_counter()
+            res = glb_cst(value, var, csp.assignment, csp.game)
+            self.record("global", glb_cst.__name__, start, not res)
+            if not res:
+                return csp.fail(glb_cst, value, var)
+        return True
+
+
+    @property
+    def results(self):
+        """
+        Returns the statistics of every component as a list of dictionnaries (kind, name, calls, failures, time), the slowest first
+        """
+        results = [
+            {"kind": kind, "name": name, "calls": calls, "failures": failures, "time": total}
+            for (kind, name), (calls, failures, total) in self.stats.items()
+        ]
+        return sorted(results, key=lambda r: r["time"], reverse=True)
+
+
+    def save_json(self, path):
+        """
+        Writes the statistics and the metrics of the CSP in a JSON file
+        """
+        with open(path, "w") as f:
+            json.dump({"components": self.results, "metrics": self.metrics}, f, indent=1)
+
+
+    def chrome_trace(self):
+        """
+        Returns the calls of the methods and heuristics in the Chrome trace-event format (times in microseconds),
+        the statistics of every component are given in otherData
+        """
+        events = [
+            {"name": name, "cat": kind, "ph": "X", "ts": (start - self.start_time) * 1e6, "dur": (end - start) * 1e6, "pid": 0, "tid": 0}
+            for name, kind, start, end in self.events
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"components": self.results, "metrics": self.metrics}}
+
+
+    def save_chrome_trace(self, path):
+        """
+        Writes the trace in a JSON file that can be opened with chrome://tracing or Perfetto
+        """
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
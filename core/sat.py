@@ -0,0 +1,264 @@
+import os
+import time
+import tempfile
+import subprocess
+import numpy as np
+
+from core.placement import PlacementCSP
+from core.cdcl import CDCL
+from core.budget import BudgetExceeded
+
+# Sentinels of the literals that are always true or always false in the encodings
+TRUE = "true"
+FALSE = "false"
+
+
+class CNF:
+    """This class builds a formula in conjunctive normal form, the literals are DIMACS integers (v and -v for the variable v).
+    The cardinality constraints are encoded with sequential counters, which only add O(n * k) variables and clauses.
+    """
+
+    def __init__(self):
+        self.nb_vars = 0
+        self.clauses = []
+        self.names = {}  # Name of some variables, written as comments in the DIMACS file
+
+
+    def new_var(self, name=None):
+        """
+        Returns a new variable
+        - name: Optional name written in the DIMACS file
+        """
+        self.nb_vars += 1
+        if name is not None:
+            self.names[self.nb_vars] = name
+        return self.nb_vars
+
+
+    def add(self, lits):
+        """
+        Adds a clause, TRUE and FALSE can be used as literals (a clause with TRUE is dropped, FALSE literals are removed)
+        """
+        if TRUE in lits:
+            return
+        self.clauses.append([lit for lit in lits if lit != FALSE])
+
+
+    @staticmethod
+    def neg(lit):
+        """
+        Returns the negation of a literal (or of TRUE and FALSE)
+        """
+        return {TRUE: FALSE, FALSE: TRUE}[lit] if isinstance(lit, str) else -lit
+
+
+    def exactly(self, lits, k):
+        """
+        Adds the clauses that make exactly k literals true, with a sequential counter:
+        counter[j] is true when at least j of the literals seen so far are true, it is updated one literal at a time
+        - lits: The literals counted
+        - k: The number of literals that must be true
+        """
+        k = int(k)
+        if k < 0 or k > len(lits):
+            self.add([])
+            return
+        counter = [TRUE] + [FALSE] * (k + 1)
+        for i, lit in enumerate(lits):
+            new = [TRUE]
+            for j in range(1, min(i + 1, k + 1) + 1):
+                var = self.new_var()
+                # var <=> counter[j] or (lit and counter[j - 1])
+                self.add([self.neg(counter[j]), var])
+                self.add([-lit, self.neg(counter[j - 1]), var])
+                self.add([-var, counter[j], lit])
+                self.add([-var, counter[j], counter[j - 1]])
+                new.append(var)
+            counter = new + [FALSE] * (k + 2 - len(new))
+        self.add([counter[k]])
+        self.add([self.neg(counter[k + 1])])
+
+
+    def save_dimacs(self, path, clauses=()):
+        """
+        Writes the formula in the DIMACS CNF format, the named variables are written as comments
+        - path: The .cnf file
+        - clauses: Clauses written after the ones of the formula (for instance the solutions already found)
+        """
+        with open(path, "w") as f:
+            for var, name in self.names.items():
+                f.write(f"c {var} {name}\n")
+            f.write(f"p cnf {self.nb_vars} {len(self.clauses) + len(clauses)}\n")
+            for clause in self.clauses:
+                f.write(" ".join(map(str, clause)) + " 0\n")
+            for clause in clauses:
+                f.write(" ".join(map(str, clause)) + " 0\n")
+
+
+class SatCSP(PlacementCSP):
+    """This class solves the puzzle with a SAT solver. The game is compiled into CNF from the legal placements of PlacementCSP:
+    - A variable for each cell (it holds a boat) and for each placement (a boat of this size is placed there)
+    - A placement fills its cells and empties the cells around it (no boat touches another one, even by a corner),
+      and a cell with a boat is covered by one of the placements
+    - Hints are boat cells (the placements that don't draw the sign of a hint are already removed)
+    - The row and column counts and the number of boats of each size are encoded with sequential counters
+
+    The formula is solved with the bundled CDCL solver (core.cdcl), or with the solver binary given by solver_path
+    (or the SAT_SOLVER environment variable), that must read a DIMACS file and print the model in the competition format ("s" and "v" lines).
+    The solutions are enumerated by adding a clause that blocks the placements of each solution found.
+    """
+
+    def __init__(self, game, domains, constraints, global_constraints, format_solution, network=None, solver_path=None):
+        super().__init__(game, domains, constraints, global_constraints, format_solution, network)
+        self.solver_path = solver_path or os.environ.get("SAT_SOLVER")
+        self.cnf, self.cell_vars, self.placement_vars = self.encode()
+
+
+    def encode(self):
+        """
+        Compiles the game into CNF
+
+        Returns the formula, the variable of each cell (row by row) and the (size, placement index, variable) of each placement
+        """
+        cnf = CNF()
+        rows, cols = self.game.get_shape
+        cell_vars = [cnf.new_var(f"cell {x} {y}") for x in range(rows) for y in range(cols)]
+        covers = [[] for _ in cell_vars]
+        placement_vars = []
+        for size, placement in self.placements.items():
+            fleet = []
+            for k, (x, y, orientation) in enumerate(placement["positions"]):
+                var = cnf.new_var(f"boat {size} {x} {y} {orientation}")
+                for cell in placement["cells"][k]:
+                    cnf.add([-var, cell_vars[cell]])
+                    covers[cell].append(var)
+                for cell in placement["around"][k]:
+                    if cell < len(cell_vars):  # The other indexes pad the cells around the boats on the border
+                        cnf.add([-var, -cell_vars[cell]])
+                fleet.append(var)
+                placement_vars.append((size, k, var))
+            cnf.exactly(fleet, self.game.boats[size])
+        for cell, var in enumerate(cell_vars):
+            cnf.add([-var] + covers[cell])
+        # Two boat cells can't be on the same diagonal (implied by the placements, it helps the propagation)
+        for x in range(rows - 1):
+            for y in range(cols):
+                for dy in (-1, 1):
+                    if 0 <= y + dy < cols:
+                        cnf.add([-cell_vars[x * cols + y], -cell_vars[(x + 1) * cols + y + dy]])
+        for cell in np.flatnonzero(self.hints):
+            cnf.add([cell_vars[cell]])
+        for x in range(rows):
+            cnf.exactly(cell_vars[x * cols:(x + 1) * cols], self.row_counts[x])
+        for y in range(cols):
+            cnf.exactly(cell_vars[y::cols], self.col_counts[y])
+        return cnf, cell_vars, placement_vars
+
+
+    def save_dimacs(self, path):
+        """
+        Writes the formula of the game in the DIMACS CNF format, to compare with other solvers
+        - path: The .cnf file
+        """
+        self.cnf.save_dimacs(path)
+
+
+    def stream(self):
+        """
+        Streams the solutions one at a time for iter_solutions, each solution is blocked before looking for the next one
+
+        Yields each solution as a dictionnary {cell: value}
+        """
+        self.start_time = time.time()
+        self.end_time = None
+        solve = self.solve_external if self.solver_path else self.load_cdcl(self.cnf)
+        blocked = []
+        while True:
+            model = solve(blocked)
+            if model is None:
+                break
+            found = {}
+            for size, k, var in self.placement_vars:
+                if model[var]:
+                    found.setdefault(size, []).append(self.placements[size]["cells"][k])
+            self.end_time = time.time()
+            yield self.to_assignment(found)
+            blocked.append([-var for _, _, var in self.placement_vars if model[var]])
+        self.end_time = time.time()
+
+
+    def load_cdcl(self, cnf):
+        """
+        Loads a formula in the bundled CDCL solver
+
+        Returns a function that takes the clauses blocking the solutions already found
+        and returns the model (value of each variable, index 0 is unused) or None if there is none
+        """
+        solver = CDCL(cnf.nb_vars)
+        for clause in cnf.clauses:
+            solver.add_clause(clause)
+        added = 0
+        # Metric of the CSP of each counter of the solver, and the part of the counter already added to it
+        metrics = {"decisions": "node_expansions", "conflicts": "number_of_backtracks", "propagations": "number_of_constraint_checks"}
+        counted = dict.fromkeys(metrics, 0)
+
+        def poll():
+            # The solver counters are added to the metrics of the CSP, so they add up between searches
+            # and the budget (that counts from the metrics at its start) can limit them
+            for counter, metric in metrics.items():
+                value = getattr(solver, counter)
+                setattr(self, metric, getattr(self, metric) + value - counted[counter])
+                counted[counter] = value
+            if self.budget is not None:
+                self.budget.poll(self, solver.level)
+
+        def solve(blocked):
+            nonlocal added
+            for clause in blocked[added:]:
+                solver.add_clause(clause)
+            added = len(blocked)
+            satisfiable = solver.solve(poll)
+            poll()
+            if not satisfiable:
+                return None
+            return [False] + [solver.values[var] == 1 for var in range(1, cnf.nb_vars + 1)]
+
+        return solve
+
+
+    def solve_external(self, blocked):
+        """
+        Solves the formula with the solver binary
+        - blocked: The clauses blocking the solutions already found
+
+        Returns the model (value of each variable, index 0 is unused) or None if there is none
+        """
+        timeout = None
+        if self.budget is not None:
+            self.budget.poll(self, 0)
+            if self.budget.time is not None:
+                timeout = max(self.budget.time - (time.time() - self.budget.start_time), 0)
+        fd, path = tempfile.mkstemp(suffix=".cnf")
+        os.close(fd)
+        try:
+            self.cnf.save_dimacs(path, blocked)
+            try:
+                output = subprocess.run([self.solver_path, path], capture_output=True, text=True, timeout=timeout).stdout
+            except subprocess.TimeoutExpired:
+                raise BudgetExceeded("time")
+        finally:
+            os.remove(path)
+        model = [False] * (self.cnf.nb_vars + 1)
+        status = None
+        for line in output.splitlines():
+            if line.startswith("s "):
+                status = line[2:].strip()
+            elif line.startswith("v "):
+                for lit in map(int, line[2:].split()):
+                    if 0 < lit <= self.cnf.nb_vars:
+                        model[lit] = True
+        if status == "UNSATISFIABLE":
+            return None
+        if status != "SATISFIABLE":
+            raise RuntimeError(f"The SAT solver {self.solver_path} gave no result :\n{output}")
+        return model
@@ -0,0 +1,90 @@
+class SupportCounts:
+    """This class counts the supports of every (variable, value) pair: the values left in the domains of its neighbours
+    that are compatible with it through their binary constraints (like BorderConstraint). They are used to order the values (see SupportLCV).
+
+    The compatible values of a neighbour are kept as a bitmask for each value, so a count is a lookup in the size table of the DomainStore.
+    The counts are updated by the DomainStore each time a domain changes (removed values and undo), so reading them costs nothing.
+    Constraints on more than two cells (MConstraint) and global constraints are not counted.
+    """
+
+    def __init__(self, csp):
+        """
+        - csp: The CSP whose domains are watched, the counts are attached to csp.domains
+        """
+        domains = csp.domains
+        self.domains = domains
+        self.values = range(len(domains.value_lists).bit_length() - 1)
+        # Bitmask of the compatible neighbour values for each value, cached by constraint type and relative position of the neighbour
+        tables = {}
+        self.neighbors = [[] for _ in domains.variables]  # (neighbour index, masks) of each variable
+        self.watchers = [[] for _ in domains.variables]  # (variable index, masks) of the variables that count the values of a neighbour
+        for i, var in enumerate(domains.variables):
+            compatible = {}
+            for cst in csp.constraints[var]:
+                cells = cst.involved_cells
+                if len(cells) != 1 or cells[0] not in domains:
+                    continue
+                cell = cells[0]
+                key = (type(cst), cell[0] - var[0], cell[1] - var[1]) if cst.shape_only else None
+                masks = tables.get(key) if key is not None else None
+                if masks is None:
+                    masks = [
+                        sum(1 << b for b in self.values if cst.is_valid(a, var, {cell: b}, csp.game)) for a in self.values
+                    ]
+                    if key is not None:
+                        tables[key] = masks
+                previous = compatible.get(cell)
+                compatible[cell] = masks if previous is None else [p & m for p, m in zip(previous, masks)]
+            for cell, masks in compatible.items():
+                j = domains.index[cell]
+                self.neighbors[i].append((j, masks))
+                self.watchers[j].append((i, masks))
+        self.build()
+        domains.supports = self
+
+
+    def build(self):
+        """
+        Counts the supports of every (variable, value) pair from the current domains
+        """
+        masks, sizes = self.domains.masks, self.domains.sizes
+        self.counts = [
+            [sum(sizes[masks[j] & compatible[a]] for j, compatible in neighbors) for a in self.values] for neighbors in self.neighbors
+        ]
+
+
+    def update(self, j, old, new):
+        """
+        Updates the counts of the variables that watch a neighbour whose domain has changed, called by the DomainStore
+        - j: Index of the neighbour
+        - old: Previous mask of its domain
+        - new: New mask of its domain
+        """
+        sizes, counts = self.domains.sizes, self.counts
+        for i, compatible in self.watchers[j]:
+            count = counts[i]
+            for a in self.values:
+                mask = compatible[a]
+                count[a] += sizes[new & mask] - sizes[old & mask]
+
+
+    def order(self, var, assignment):
+        """
+        Orders the values of a variable from the most supported to the least supported, only the unassigned neighbours are counted
+        - var: The variable of the CSP
+        - assignment: The current assignment
+
+        Returns the values of the domain of var
+        """
+        domains = self.domains
+        i = domains.index[var]
+        count = self.counts[i]
+        values = domains.value_lists[domains.masks[i]]
+        scores = {a: count[a] for a in values}
+        # The counts include every neighbour, the assigned ones are taken out
+        for j, compatible in self.neighbors[i]:
+            if domains.variables[j] in assignment:
+                mask = domains.masks[j]
+                for a in values:
+                    scores[a] -= domains.sizes[mask & compatible[a]]
+        return sorted(values, key=lambda a: -scores[a])
@@ -0,0 +1,233 @@
+import json
+import mmap
+import struct
+
+# Kinds of records
+DECISION = 1  # A value is given to a cell
+PRUNE = 2  # A value is removed from the domain of a cell
+FAILURE = 3  # A constraint rejected a value
+BACKTRACK = 4  # The value of a cell is undone
+SOLUTION = 5  # Every cell has a value
+kinds = {DECISION: "decision", PRUNE: "prune", FAILURE: "failure", BACKTRACK: "backtrack", SOLUTION: "solution"}
+
+# kind, value, constraint code, depth, x, y (12 bytes), the depth can reach the number of cells of the board
+RECORD = struct.Struct("<BBBxIHH")
+MAGIC = b"CSPTRACE"
+HEADER = struct.Struct("<8sI")  # Magic and size of the JSON description that follows
+
+
+class SearchTrace:
+    """This class writes what the search does (decisions, prunings, failures, backtracks and solutions) in a binary file.
+    Every event is a fixed-width record (see RECORD), they are packed in a buffer written to the file when it is full.
+    The file starts with a JSON description: the shape of the board and the names of the constraints, a record only keeps
+    the code of its constraint (its index in this list, 0 when there is none).
+    """
+
+    def __init__(self, path, csp, buffer_size=1 << 16):
+        """
+        - path: The file where the trace is written
+        - csp: The CSP traced, its constraints are numbered in the description
+        - buffer_size: Number of bytes kept before they are written
+
+        Raises a ValueError if the board, the values or the constraints of the CSP don't fit in the records
+        """
+        names = sorted({type(cst).__name__ for constraints in csp.constraints.values() for cst in constraints})
+        names += [glb_cst.__name__ for glb_cst in csp.global_constraints]
+        # Every field of a record must fit its size, a bigger board or game can't be traced
+        if any(size > 0xFFFF for size in csp.game.get_shape):
+            raise ValueError(f"A board of shape {tuple(csp.game.get_shape)} can't be traced, the coordinates are kept on 16 bits")
+        if csp.game.max_boat_size > 0xFF or len(names) >= 0xFF:
+            raise ValueError("The values and the constraint codes of a trace are kept on 8 bits, this game has too many of them")
+        self.codes = {name: code for code, name in enumerate(["none"] + names)}
+        description = json.dumps({"shape": list(csp.game.get_shape), "constraints": ["none"] + names}).encode()
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, len(description)) + description)
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def code(self, failure):
+        """
+        Returns the code of the constraint of a failed check (constraint, value, var), 0 if there is none
+        """
+        if failure is None:
+            return 0
+        cst = failure[0]
+        return self.codes.get(getattr(cst, "__name__", None) or type(cst).__name__, 0)
+
+
+    def write(self, kind, value, code, depth, cell):
+        """
+        Adds a record to the buffer, and writes the buffer when it is full
+        """
+        self.buffer += RECORD.pack(kind, value, code, depth, cell[0], cell[1])
+        if len(self.buffer) >= self.buffer_size:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+
+    def decision(self, csp, var, value):
+        """
+        Records a value given to a cell by the search, at the depth of its frame
+        """
+        self.write(DECISION, value, 0, max(len(csp.frames) - 1, 0), var)
+
+
+    def prune(self, csp, var, value, failure):
+        """
+        Records a value removed from a domain, with the constraint that removed it when it is known
+        """
+        self.write(PRUNE, value, self.code(failure), len(csp.frames), var)
+
+
+    def failure(self, csp, failure):
+        """
+        Records a failed check (constraint, value, var)
+        """
+        cst, value, var = failure
+        self.write(FAILURE, value, self.code(failure), len(csp.frames), var)
+
+
+    def backtrack(self, csp, var):
+        """
+        Records the value of a cell being undone (called before the cell is unassigned)
+        """
+        self.write(BACKTRACK, csp.assignment[var], 0, max(len(csp.frames) - 1, 0), var)
+
+
+    def solution(self, csp):
+        """
+        Records a complete assignment
+        """
+        self.write(SOLUTION, 0, 0, len(csp.frames), (0, 0))
+
+
+    def close(self):
+        """
+        Writes the records left in the buffer and closes the file
+        """
+        if not self.file.closed:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+            self.file.close()
+
+
+class TraceReader:
+    """This class reads a trace written by SearchTrace. The file is memory mapped, so the records are decoded
+    one at a time without loading the whole trace.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a search trace")
+        description = json.loads(bytes(self.map[HEADER.size:HEADER.size + size]))
+        self.shape = tuple(description["shape"])
+        self.constraints = description["constraints"]
+        self.offset = HEADER.size + size
+        # A trace cut while it was written ends with an incomplete record, it is ignored
+        self.nb_records = (len(self.map) - self.offset) // RECORD.size
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def __len__(self):
+        return self.nb_records
+
+
+    def records(self):
+        """
+        Yields every record as a tuple (kind, value, constraint code, depth, x, y)
+        """
+        end = self.offset + self.nb_records * RECORD.size
+        view = memoryview(self.map)[self.offset:end]
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+
+    def replay(self):
+        """
+        Rebuilds the search tree from the decisions and backtracks
+
+        Returns the list of nodes, each node is a dictionnary with its parent (index of the node, None at the root), depth, cell, value,
+        the number of values pruned and of failed checks below it, and its status ("open", "solution" or "backtracked")
+        """
+        nodes = []
+        branch = []  # Index of the nodes of the current branch
+        for kind, value, code, depth, x, y in self.records():
+            if kind == DECISION:
+                del branch[depth:]
+                nodes.append({"parent": branch[-1] if branch else None, "depth": depth, "cell": (x, y), "value": value,
+                              "pruned": 0, "failures": 0, "status": "open"})
+                branch.append(len(nodes) - 1)
+            elif kind == BACKTRACK:
+                # The deepest node of this cell is closed
+                while branch and nodes[branch[-1]]["cell"] != (x, y):
+                    branch.pop()
+                if branch:
+                    node = nodes[branch.pop()]
+                    if node["status"] == "open":
+                        node["status"] = "backtracked"
+            elif kind == SOLUTION and branch:
+                nodes[branch[-1]]["status"] = "solution"
+            elif kind == PRUNE and branch:
+                nodes[branch[-1]]["pruned"] += 1
+            elif kind == FAILURE and branch:
+                nodes[branch[-1]]["failures"] += 1
+        return nodes
+
+
+    def summary(self, top=10):
+        """
+        Counts the events of the trace and finds the failure hotspots
+        - top: Number of cells and constraints kept in each ranking
+
+        Returns a dictionnary with the number of records of each kind, the cells with the most failures and backtracks
+        and the constraints with the most failures
+        """
+        counts = {name: 0 for name in kinds.values()}
+        cell_failures, cell_backtracks, constraint_failures = {}, {}, {}
+        for kind, value, code, depth, x, y in self.records():
+            counts[kinds[kind]] += 1
+            if kind == FAILURE:
+                cell_failures[(x, y)] = cell_failures.get((x, y), 0) + 1
+                name = self.constraints[code] if code < len(self.constraints) else "none"
+                constraint_failures[name] = constraint_failures.get(name, 0) + 1
+            elif kind == BACKTRACK:
+                cell_backtracks[(x, y)] = cell_backtracks.get((x, y), 0) + 1
+
+        def ranking(counter):
+            return sorted(counter.items(), key=lambda item: item[1], reverse=True)[:top]
+
+        return {
+            "records": counts,
+            "cell_failures": ranking(cell_failures),
+            "cell_backtracks": ranking(cell_backtracks),
+            "constraint_failures": ranking(constraint_failures),
+        }
+
+
+    def close(self):
+        """
+        Closes the memory map and the file
+        """
+        self.map.close()
+        self.file.close()
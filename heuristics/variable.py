@@ -1,4 +1,5 @@
 from heuristics.heuristic import Heuristic
+from constraints.global_constraints import GlobalConstraints
 
 h_type = "variable"
 
@@ -20,11 +21,23 @@ class MRV(Heuristic):
         - A list of variables from "unassigned_vars" that have the smallest domain size (minimum remaining values)
         If there is a tie, all variables with the smallest domain size are returned for potential future heuristics
         """
-        min_value = min(len(csp.domains[var]) for var in unassigned_variable)
-        values = [var for var in unassigned_variable if len(csp.domains[var]) == min_value]
+        min_value = min(csp.domains.size(var) for var in unassigned_variable)
+        values = [var for var in unassigned_variable if csp.domains.size(var) == min_value]
         return values
 
 
+    @staticmethod
+    def candidates(csp, first=False):
+        """
+        Selects the variables with the fewest values left from the buckets of domain sizes kept by csp.domains,
+        used instead of apply when MRV is the first variable heuristic, so the unassigned variables are not listed at each node
+        - first: True when no other heuristic follows, only the first of these variables is needed
+
+        Returns the same variables as apply on every unassigned variable (or only the first one)
+        """
+        return csp.domains.smallest(csp.assignment, first)
+
+
 class MaxDegree(Heuristic):
 
     @staticmethod
@@ -46,11 +59,106 @@ class MaxDegree(Heuristic):
         max_degree = -1
         best_variables = []
         for var in unassigned_variable:
-            involved_cells = set([cells for constraint in csp.constraints[var] for cells in constraint.involved_cells])
-            degree = sum([1 for cell in involved_cells if cell in unassigned_variable])
+            degree = sum([1 for cell in csp.network.neighbors(var) if cell not in csp.assignment])
             if degree > max_degree:
                 max_degree = degree
                 best_variables = [var]
             elif degree >= max_degree:
                 best_variables.append(var)
-        return best_variables
\ No newline at end of file
+        return best_variables
+
+
+class DomWdeg(Heuristic):
+    """This heuristic (dom/wdeg) learns where the search fails: each constraint starts with a weight of 1, and every time it fails
+    (a value rejected by is_consistent, in the search or while propagating) its weight grows by 1.
+    The weighted degree of a variable is the sum of the weights of its constraints, so a failure adds 1 to the weighted degree
+    of every variable of the scope of the constraint, and only the weighted degrees are kept.
+    The variable selected has the smallest domain size relative to its weighted degree.
+
+    The weighted degrees are attached to csp.domains, which keeps the score of every variable in a heap updated with each change
+    of domain or weight (like the buckets of MRV), so a selection only reads the top of the heap instead of scoring every variable.
+    """
+
+    @staticmethod
+    def get_type():
+        return h_type
+
+    @staticmethod
+    def apply(unassigned_variable, csp):
+        """
+        This method implements the dom/wdeg heuristic, which selects the variable with the smallest ratio between its domain size
+        and its weighted degree (the sum of the weights of its constraints)
+        - unassigned_vars: A list of variables that have not yet been assigned a value
+        - assignment: the current variable assignment of the CSP
+
+        Returns:
+        - A list of variables from "unassigned_vars" with the smallest ratio
+        If there is a tie, all variables with the same ratio are returned for potential future heuristics
+        """
+        wdeg, index = DomWdeg.state(csp)["wdeg"], csp.domains.index
+        best_size, best_wdeg = None, 1
+        best_variables = []
+        for var in unassigned_variable:
+            size, weight = csp.domains.size(var), wdeg[index[var]]
+            # size / weight < best_size / best_wdeg, without floats
+            if best_size is None or size * best_wdeg < best_size * weight:
+                best_size, best_wdeg = size, weight
+                best_variables = [var]
+            elif size * best_wdeg == best_size * weight:
+                best_variables.append(var)
+        return best_variables
+
+
+    @staticmethod
+    def candidates(csp, first=False):
+        """
+        Selects the variables with the smallest ratio from the heap of scores kept by csp.domains,
+        used instead of apply when dom/wdeg is the first variable heuristic, so the unassigned variables are not scored at each node
+        - first: True when no other heuristic follows, only the first of these variables is needed
+
+        Returns the same variables as apply on every unassigned variable (or only the first one)
+        """
+        DomWdeg.state(csp)
+        return csp.domains.best_scores(csp.assignment, first)
+
+
+    @staticmethod
+    def state(csp):
+        """
+        Returns the weighted degrees of the variables of the CSP (in the order of csp.domains), they are kept between two calls
+        """
+        if csp.dom_wdeg is None:
+            DomWdeg.reset(csp)
+        return csp.dom_wdeg
+
+
+    @staticmethod
+    def reset(csp):
+        """
+        Gives a weight of 1 to every constraint again, the weighted degree of a variable is then its number of constraints
+        """
+        wdeg = [len(csp.constraints[var]) + len(csp.global_constraints) for var in csp.domains.variables]
+        csp.dom_wdeg = {"wdeg": wdeg}
+        csp.domains.wdeg = wdeg
+        csp.domains.scores = None
+
+
+    @staticmethod
+    def weigh(csp, failure):
+        """
+        Increases the weight of a constraint that has failed (by 1), and so the weighted degree of every variable of its scope,
+        called by CSP.is_consistent
+        - failure: (constraint, value, var) of the failed check
+        """
+        cst, value, var = failure
+        DomWdeg.state(csp)
+        if hasattr(cst, "involved_cells"):
+            cells = cst.involved_cells
+        else:
+            # A global constraint is checked on the whole board, the constraint that failed is the part of it the failure depends on
+            # (a row or a column for the counts, the cells around the boat for its size), so every cell of this part is weighted.
+            # Only the variable itself is weighted when the failure depends on the whole board
+            cells = GlobalConstraints.scope(cst, value, var, csp.assignment, csp.game) or []
+        index = csp.domains.index
+        i = index[var]
+        csp.domains.weigh([i] + [j for j in map(index.get, cells) if j is not None and j != i])
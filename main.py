@@ -1,6 +1,9 @@
 # Core Objects
 from core.csp import CSP
 from core.game import Game
+from core.bitboard import BitboardCSP
+from core.placement import PlacementCSP
+from core.sat import SatCSP
 
 # Constraints
 from constraints.m_constraint import MConstraint
@@ -12,7 +15,7 @@ from heuristics.value import LCV
 from heuristics.variable import MRV, MaxDegree
 
 # Methods
-from methods.ac3 import AC3
+from methods.ac3 import AC3, MAC
 from methods.forward_check import ForwardCheck
 
 # Process
@@ -32,4 +35,9 @@ if __name__ == "__main__":
             MaxDegree = MaxDegree,
             AC3 = AC3,
             ForwardCheck = ForwardCheck,
+            MAC = MAC,
+            BitboardCSP = BitboardCSP,
+            PlacementCSP = PlacementCSP,
+            SatCSP = SatCSP,
+            engine = "csp",
     )
\ No newline at end of file
@@ -9,43 +9,97 @@ class AC3(Method):
         return m_type
 
     @staticmethod
-    def apply(csp):
+    def apply(csp, var=None):
         """
-        This is the AC-3 (Arc Consistency 3) method, used to reduce the domains of variables by enforcing arc consistency before applying backtracking.
+        This is the arc consistency method, used to reduce the domains of variables by enforcing arc consistency before applying backtracking.
         It ensures that every variable in the CSP has a valid domain with respect to its constraints, thereby simplifying the problem.
-        - assignment: the current variable assignment of the CSP
+        It follows AC-3.1 with residual supports: the arcs are compiled once in csp.network, and the last support found for each (cell, value, neighbour)
+        is kept in csp.ac3_residues (until reset_all) so it can be checked first instead of scanning the whole domain of the neighbour again.
+        - var: the variable that has just been assigned a value, only its arcs are propagated. When it is None every arc is checked.
 
         Returns True if all variables still have available values, else False
         """
-        queue = [(cell, cst_cell) for cell in csp.game.variables for cst_cell in set([cells for constraint in csp.constraints[cell] for cells in constraint.involved_cells])]
+        residues = csp.ac3_residues
+        if var is None:
+            # The global constraints only depend on the cell value and the current assignment, they are checked once per value
+            for cell in csp.game.variables:
+                if cell not in csp.assignment:
+                    for value in csp.domains[cell]:
+                        if not csp.is_consistent(cell, value):
+                            csp.prune(cell, value, csp.failure)
+                    if not csp.domains.size(cell):
+                        return False
+            queue = list(csp.network.arcs)
+        else:
+            queue = [(cell, var) for cell in csp.network.neighbors(var) if cell not in csp.assignment]
+        in_queue = set(queue)
         while queue:
             (cell, cst_cell) = queue.pop()
-            if AC3.remove_inconsistent_values(cell, cst_cell, csp):
-                if not csp.domains[cell]:  # If cell has no value left, return False
+            in_queue.discard((cell, cst_cell))
+            if cell in csp.assignment:
+                continue
+            if AC3.remove_inconsistent_values(cell, cst_cell, csp, residues):
+                if not csp.domains.size(cell):  # If cell has no value left, return False
                     return False
-                for _cell in set([cells for constraint in csp.constraints[cell] for cells in constraint.involved_cells]):
-                    if _cell != cst_cell:
-                        queue.append((_cell, cst_cell))
+                # Every neighbour of cell may have lost its support in cell
+                for _cell in csp.network.neighbors(cell):
+                    if _cell != cst_cell and _cell not in csp.assignment and (_cell, cell) not in in_queue:
+                        queue.append((_cell, cell))
+                        in_queue.add((_cell, cell))
         return True
-    
+
 
     @staticmethod
-    def remove_inconsistent_values(cell, cst_cell, csp):
+    def remove_inconsistent_values(cell, cst_cell, csp, residues):
         """
         This function removes inconsistent values from the domain of a variable to ensure arc consistency
         It checks whether there is a value in the domain of one variable that conflicts with all possible values of its neighbor,
         removing such inconsistent values
         - cell: the cell we want to ensure arc consistency
         - cst_cell: the neighboring cell involved in the constraint with cell
-        - assignment: the current variable assignment of the CSP
+        - residues: the last support found for each (cell, value, cst_cell)
 
         Returns True if at least a variable lost a value, else False
         """
-        removed = False
+        removed = []
+        # An assigned neighbour only supports its value
+        cst_values = (csp.assignment[cst_cell],) if cst_cell in csp.assignment else csp.domains[cst_cell]
         for value in csp.domains[cell]:
             csp.assignment[cell] = value
-            if not any(csp.is_consistent(cst_cell, cst_value) for cst_value in csp.domains[cst_cell]):
-                csp.domains[cell].remove(value)
-                removed = True
+            key = (cell, value, cst_cell)
+            support = residues.get(key)
+            # The residue is checked again because the constraints also depend on the other assigned cells
+            if support is None or support not in cst_values or not AC3.is_supported(cst_cell, support, csp):
+                support = next((cst_value for cst_value in cst_values if AC3.is_supported(cst_cell, cst_value, csp)), None)
+                if support is None:
+                    removed.append(value)
+                else:
+                    residues[key] = support
             del csp.assignment[cell]
-        return removed
\ No newline at end of file
+        for value in removed:
+            csp.prune(cell, value)
+        return len(removed) > 0
+
+
+    @staticmethod
+    def is_supported(cst_cell, cst_value, csp):
+        """
+        Checks the unit constraints of a cell (the global constraints are left to the search)
+        - cst_cell: the neighboring cell
+        - cst_value: the value tested for the neighboring cell
+
+        Returns True if every unit constraint of the cell is respected, else False
+        """
+        for cst in csp.constraints[cst_cell]:
+            csp.number_of_constraint_checks += 1
+            if not cst.is_valid(cst_value, cst_cell, csp.assignment, csp.game):
+                return False
+        return True
+
+
+class MAC(AC3):
+    """This method maintains arc consistency during the search: every time a variable is assigned, its arcs are propagated with AC3"""
+
+    @staticmethod
+    def get_type():
+        return "mac"
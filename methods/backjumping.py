@@ -0,0 +1,234 @@
+from collections import OrderedDict
+
+from methods.method import Method
+from constraints.global_constraints import GlobalConstraints
+
+m_type = "cbj"
+
+class Backjumping(Method):
+    """This method replaces the chronological backtracking with conflict-directed backjumping.
+    Every failure is explained by the assigned variables involved in it (the scope of the constraint that failed),
+    and every value removed from a domain keeps the explanation of its removal. When every value of a variable has failed,
+    the search jumps straight back to the most recent variable of the conflict set instead of the previous one.
+    The conflict sets are also recorded as nogoods (assignments that can't be part of a solution) in a bounded cache.
+
+    A conflict set is a bitmask of depths in the current branch (bit d is the variable assigned at depth d),
+    so unions and membership tests are integer operations.
+    """
+
+    max_nogoods = 10000  # Number of nogoods kept, the least recently used are evicted
+    max_nogood_size = 8  # Bigger conflict sets are not recorded, they would rarely be found again
+
+    @staticmethod
+    def get_type():
+        return m_type
+
+    @staticmethod
+    def apply(csp, var):
+        """
+        Checks the recorded nogoods when a variable has just been assigned. Each nogood watches two of its (cell, value) pairs
+        that are not part of the assignment, it only has to be checked when one of them gets assigned.
+        - var: the variable that has just been assigned a value.
+
+        Returns True if no nogood is part of the assignment, else False
+        """
+        state = Backjumping.state(csp)
+        watch, watched = state["watch"], state["watched"]
+        assignment = csp.assignment
+        literal = (var, assignment[var])
+        for nogood in list(watch.get(literal, ())):
+            csp.number_of_constraint_checks += 1
+            first, second = watched[nogood]
+            other = second if first == literal else first
+            # Watch another pair that is not assigned yet
+            for cell, value in nogood:
+                if assignment.get(cell) != value and (cell, value) != other:
+                    watched[nogood] = (other, (cell, value))
+                    watch[literal].discard(nogood)
+                    watch.setdefault((cell, value), set()).add(nogood)
+                    break
+            else:
+                if assignment.get(other[0]) == other[1]:
+                    state["nogoods"].move_to_end(nogood)
+                    state["violated"] = nogood
+                    return False
+        return True
+
+
+    @staticmethod
+    def state(csp):
+        """
+        Returns the explanations of the removed values and the nogoods of the CSP, they are kept between two calls
+        """
+        if csp.backjumping is None:
+            Backjumping.reset(csp)
+        return csp.backjumping
+
+
+    @staticmethod
+    def reset(csp):
+        """
+        Forgets the explanations and the nogoods (the nogoods learned in a subproblem are only true in this subproblem)
+        """
+        csp.backjumping = {"explanations": {}, "nogoods": OrderedDict(), "watch": {}, "watched": {}, "violated": None, "depth": {}}
+
+
+    @staticmethod
+    def culprits(csp, failure):
+        """
+        Finds the assigned variables that explain why a constraint failed
+        - failure: (constraint, value, var) of the failed check, see CSP.is_consistent
+
+        Returns the conflict set of the assigned variables in the scope of the constraint
+        """
+        if failure is not None:
+            cst, value, var = failure
+            cells = cst.involved_cells if hasattr(cst, "involved_cells") else GlobalConstraints.scope(cst, value, var, csp.assignment, csp.game)
+            if cells is not None:
+                depth, assignment = Backjumping.state(csp)["depth"], csp.assignment
+                conflict = 0
+                for cell in cells:
+                    # The variables assigned before the search (in a subproblem) never change, they are not part of the conflict
+                    if cell in assignment and cell in depth:
+                        conflict |= 1 << depth[cell]
+                return conflict
+        # Every assigned variable of the branch
+        nb = len(csp.frames)
+        return (1 << (nb if nb and csp.frames[-1][0] in csp.assignment else max(nb - 1, 0))) - 1
+
+
+    @staticmethod
+    def explain(csp, var, value, failure=None):
+        """
+        Keeps the explanation of a value removed from a domain
+        - var: The variable that lost a value
+        - value: The value removed
+        - failure: The failed check that removed the value, None when it is unknown (every assigned variable is then involved)
+        """
+        Backjumping.state(csp)["explanations"][(var, value)] = Backjumping.culprits(csp, failure)
+
+
+    @staticmethod
+    def removed(csp, var):
+        """
+        Returns the union of the explanations of every value removed from the domain of a variable
+        """
+        explanations = Backjumping.state(csp)["explanations"]
+        conflict = 0
+        for value in range(csp.game.max_boat_size + 1):
+            if not csp.domains.contains(var, value):
+                conflict |= explanations.get((var, value), 0)
+        return conflict
+
+
+    @staticmethod
+    def learn(csp, conflict):
+        """
+        Records the assignment of a conflict set as a nogood
+        - conflict: Assigned variables that can't keep their values together in a solution
+        """
+        if not conflict or conflict.bit_count() > Backjumping.max_nogood_size:
+            return
+        state = Backjumping.state(csp)
+        nogoods, watch, watched = state["nogoods"], state["watch"], state["watched"]
+        cells = [csp.frames[d][0] for d in range(conflict.bit_length()) if conflict >> d & 1]
+        nogood = frozenset((cell, csp.assignment[cell]) for cell in cells)
+        if nogood in nogoods:
+            return
+        nogoods[nogood] = True
+        # The two deepest variables are unassigned first when the search goes back, they are the first pairs to watch
+        first, second = (cells[-1], cells[-2]) if len(cells) > 1 else (cells[-1], cells[-1])
+        watched[nogood] = ((first, csp.assignment[first]), (second, csp.assignment[second]))
+        for literal in set(watched[nogood]):
+            watch.setdefault(literal, set()).add(nogood)
+        if len(nogoods) > Backjumping.max_nogoods:
+            evicted, _ = nogoods.popitem(last=False)
+            for literal in watched.pop(evicted):
+                watch[literal].discard(evicted)
+
+
+    @staticmethod
+    def search(csp, var=None, values=None):
+        """
+        Explores the search tree like CSP.search, but jumps back over the variables that are not involved in a failure.
+        The frames of csp.frames are the explicit stack of the branch, the conflict set of each frame is kept in a parallel stack.
+        - var: The variable to branch on, selected with the heuristics by default
+        - values: The values tried for var, ordered with the heuristics by default
+
+        Yields every complete assignment, and returns the conflict set of the node
+        (None when a solution has been found below it, the search then goes back chronologically)
+        """
+        frames = csp.frames
+        base = len(frames)
+        nodes = []  # [conflict set, solution found, number of values tried, number of values] of each frame
+        child = None  # Result of the last explored subtree: its conflict set, None if a solution has been found
+        while True:
+            # Enter a new node
+            if csp.work_sharing is not None:
+                csp.work_sharing.poll(csp)
+            if csp.budget is not None:
+                csp.budget.poll(csp)
+            if len(csp.assignment) == len(csp.game.variables):
+                if csp.trace is not None:
+                    csp.trace.solution(csp)
+                yield csp.assignment
+                child = None
+            else:
+                if var is None:
+                    var = csp.select_unassigned_variable()
+                    values = csp.order_domain_values(var)
+                values = list(values)
+                nodes.append([Backjumping.removed(csp, var), False, 0, len(values)])
+                Backjumping.state(csp)["depth"][var] = len(frames)
+                frames.append((var, values))  # Another process can take the values left (see share_work)
+            var = None
+
+            entered = False
+            while len(frames) > base:
+                node_var, remaining = frames[-1]
+                node = nodes[-1]
+                bit = 1 << (len(frames) - 1)
+                if node_var in csp.assignment:
+                    csp.unassign(node_var)
+                    csp.number_of_backtracks += 1
+                    if child is None:
+                        node[1] = True
+                    elif not child & bit and not node[1]:
+                        # The failure doesn't depend on node_var, its other values would fail the same way
+                        frames.pop()
+                        nodes.pop()
+                        continue
+                    else:
+                        node[0] |= child & ~bit
+                if not remaining:
+                    frames.pop()
+                    nodes.pop()
+                    conflict, found, tried, nb_values = node
+                    # Values given to another process may lead to a solution, nothing can be learned
+                    if found or tried < nb_values:
+                        child = None
+                    else:
+                        Backjumping.learn(csp, conflict)
+                        child = conflict
+                    continue
+                value = remaining.pop(0)
+                node[2] += 1
+                if not csp.is_consistent(node_var, value):
+                    node[0] |= Backjumping.culprits(csp, csp.failure)
+                    continue
+                csp.node_expansions += 1
+                csp.wipeout = None
+                filtered = csp.assign(node_var, value)
+                if filtered and Backjumping.apply(csp, node_var):
+                    entered = True
+                    break
+                elif filtered:
+                    state = Backjumping.state(csp)
+                    child = sum(1 << state["depth"][cell] for cell, _ in state["violated"])
+                elif csp.wipeout is not None:
+                    # Every value of the wiped out variable has been removed, their explanations explain the failure
+                    child = Backjumping.removed(csp, csp.wipeout)
+                else:
+                    child = Backjumping.culprits(csp, None)
+            if not entered:
+                return child
@@ -13,25 +13,16 @@ class ForwardCheck(Method):
             """
             This method implements forward checking, a constraint propagation technique used during backtracking search
             It prunes the domains of unassigned variables to ensure consistency with the current assignment, reducing the search space
+            The removed values are written on the trail of csp.domains (see csp.prune), so the caller restores them with csp.domains.undo()
             - var: the variable that has just been assigned a value.
 
-            Returns
-            - True if forward checking doesn't fail, else False.
-            - a dictionnary of removed value to keep it in memory
+            Returns True if forward checking doesn't fail, else False.
             """
-            involved_cells = set([cells for constraint in csp.constraints[var] for cells in constraint.involved_cells])
-            removed_values = {}
-            for cell in involved_cells:
+            for cell in csp.network.neighbors(var):
                 if cell not in csp.assignment:
-                    fixed_values = csp.domains[cell].copy()  # Otherwise the loop misses values because it deletes them
-                    for cell_value in fixed_values:
+                    for cell_value in csp.domains[cell]:  # The domain is a tuple, removing values doesn't change it
                         if not csp.is_consistent(cell, cell_value):
-                            csp.domains[cell].remove(cell_value)
-                            if cell in removed_values:
-                                removed_values[cell].append(cell_value)
-                            else:
-                                removed_values[cell] = [cell_value]
-                            csp.pruned_values += 1
-                if not csp.domains[cell]:
-                    return False, removed_values
-            return True, removed_values
\ No newline at end of file
+                            csp.prune(cell, cell_value, csp.failure)
+                if not csp.domains.size(cell):
+                    return False
+            return True
@@ -0,0 +1,155 @@
+from methods.method import Method
+
+m_type = "line"
+
+class LinePropagation(Method):
+    """This method reasons over whole rows and columns, like a person solving the puzzle by hand:
+    - when the boats left to place in a line are as many as the cells of the line that can still be a boat, they all become boats
+    - when the water left in a line is as much as the cells that can still be water, they all become water
+    - a cell keeps a boat size only if a whole boat of this size fits through it, in its row or in its column,
+      with cells that can all take this size and without needing more boat cells than the line has left
+    """
+
+    @staticmethod
+    def get_type():
+        return m_type
+
+    @staticmethod
+    def apply(csp, var=None):
+        """
+        Propagates the counts of the lines until nothing changes anymore.
+        The removed values are written on the trail of csp.domains (see csp.prune), so the caller restores them with csp.domains.undo()
+        - var: the variable that has just been assigned a value, only its row and column are propagated first. When it is None every line is checked.
+
+        Returns True if every line can still reach its count, else False
+        """
+        rows, cols = csp.game.get_shape
+        if var is None:
+            queue = [(0, x) for x in range(rows)] + [(1, y) for y in range(cols)]
+        else:
+            queue = [(0, var[0]), (1, var[1])]
+        in_queue = set(queue)
+        while queue:
+            line = queue.pop()
+            in_queue.discard(line)
+            changed = LinePropagation.revise(csp, line)
+            if changed is None:
+                return False
+            # A cell that lost a value changes the counts of its row and its column
+            for x, y in changed:
+                for other in [(0, x), (1, y)]:
+                    if other not in in_queue:
+                        queue.append(other)
+                        in_queue.add(other)
+        return True
+
+
+    @staticmethod
+    def revise(csp, line):
+        """
+        Applies the deductions of a line
+        - line: (0, row index) for a row, (1, col index) for a column
+
+        Returns the cells that lost a value, or None if the line can't reach its count anymore
+        """
+        kind, index = line
+        rows, cols = csp.game.get_shape
+        assignment, domains = csp.assignment, csp.domains
+        if kind == 0:
+            cells = [(index, y) for y in range(cols)]
+            boats_left = csp.game.rows[index] - assignment.row_boats[index]
+            water_left = cols - csp.game.rows[index] - assignment.row_water[index]
+        else:
+            cells = [(x, index) for x in range(rows)]
+            boats_left = csp.game.cols[index] - assignment.col_boats[index]
+            water_left = rows - csp.game.cols[index] - assignment.col_water[index]
+        free = [cell for cell in cells if cell not in assignment]
+        may_be_boat = [cell for cell in free if domains.size(cell) > 1 or not domains.contains(cell, 0)]
+        may_be_water = [cell for cell in free if domains.contains(cell, 0)]
+        csp.number_of_constraint_checks += 1
+        if boats_left < 0 or water_left < 0 or boats_left > len(may_be_boat) or water_left > len(may_be_water):
+            return None
+
+        changed = set()
+        if boats_left == len(may_be_boat):
+            for cell in may_be_boat:
+                if domains.contains(cell, 0):
+                    LinePropagation.remove(csp, cell, 0, changed)
+        if water_left == len(may_be_water):
+            for cell in may_be_water:
+                for value in domains[cell]:
+                    if value > 0:
+                        LinePropagation.remove(csp, cell, value, changed)
+
+        for cell in free:
+            for value in domains[cell]:
+                if value > 1 and not LinePropagation.fits(csp, cell, value):
+                    LinePropagation.remove(csp, cell, value, changed)
+        for cell in changed:
+            if not domains.size(cell):
+                return None
+        return changed
+
+
+    @staticmethod
+    def remove(csp, cell, value, changed):
+        """
+        Removes a value from the domain of a cell and keeps the cell in changed
+        """
+        csp.prune(cell, value)
+        changed.add(cell)
+
+
+    @staticmethod
+    def fits(csp, cell, value):
+        """
+        Checks that a boat of size value can go through a cell, horizontally or vertically
+        - cell: The cell that may be part of the boat
+        - value: The size of the boat
+
+        Returns True if the boat fits in the row or in the column of the cell, else False
+        """
+        rows, cols = csp.game.get_shape
+        assignment = csp.assignment
+        x, y = cell
+        for dx, dy, boats_left in [
+            (0, 1, csp.game.rows[x] - assignment.row_boats[x]),
+            (1, 0, csp.game.cols[y] - assignment.col_boats[y]),
+        ]:
+            for start in range(value):
+                first = (x - start * dx, y - start * dy)
+                last = (first[0] + (value - 1) * dx, first[1] + (value - 1) * dy)
+                if first[0] < 0 or first[1] < 0 or last[0] >= rows or last[1] >= cols:
+                    continue
+                boat = [(first[0] + i * dx, first[1] + i * dy) for i in range(value)]
+                if not all(LinePropagation.can_be(csp, c, value) for c in boat):
+                    continue
+                # The boat needs a boat cell for each of its free cells in the line
+                if sum(1 for c in boat if c not in assignment) > boats_left:
+                    continue
+                # The cells at both ends can't be part of the same boat, or it would be longer
+                before, after = (first[0] - dx, first[1] - dy), (last[0] + dx, last[1] + dy)
+                if LinePropagation.only(csp, before, value) or LinePropagation.only(csp, after, value):
+                    continue
+                return True
+        return False
+
+
+    @staticmethod
+    def can_be(csp, cell, value):
+        """
+        Returns True if the cell has this value or can still take it, else False
+        """
+        if cell in csp.assignment:
+            return csp.assignment[cell] == value
+        return csp.domains.contains(cell, value)
+
+
+    @staticmethod
+    def only(csp, cell, value):
+        """
+        Returns True if the cell is on the board and can only have this value, else False
+        """
+        if cell in csp.assignment:
+            return csp.assignment[cell] == value
+        return cell in csp.domains and csp.domains.size(cell) == 1 and csp.domains.contains(cell, value)
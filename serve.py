@@ -0,0 +1,71 @@
+# Regular import
+import asyncio
+import argparse
+
+# Core Objects
+from core.csp import CSP
+from core.game import Game
+from core.bitboard import BitboardCSP
+from core.placement import PlacementCSP
+from core.sat import SatCSP
+
+# Constraints
+from constraints.m_constraint import MConstraint
+from constraints.border_constraint import BorderConstraint
+from constraints.global_constraints import GlobalConstraints
+
+# Heuristics
+from heuristics.value import LCV
+from heuristics.variable import MRV, MaxDegree
+
+# Methods
+from methods.ac3 import AC3, MAC
+from methods.forward_check import ForwardCheck
+
+# Process
+from app.server import SolverService
+
+
+async def serve(args, builders):
+    service = SolverService(builders, workers=args.workers, queue_size=args.queue, engine=args.engine,
+                            deadline=args.deadline, cache_path=args.cache)
+    await service.start(host=args.host, port=args.port, unix_path=args.unix, http_port=args.http_port)
+    print(f"Serving on {service.addresses} with {service.workers} workers", flush=True)
+    await service.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a BattleShip solver over newline-delimited JSON (TCP or Unix socket) and HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="Address of the TCP and HTTP servers")
+    parser.add_argument("--port", type=int, default=None, help="Port of the JSON lines server over TCP")
+    parser.add_argument("--unix", default=None, help="Path of the JSON lines server over a Unix socket")
+    parser.add_argument("--http-port", type=int, default=None, help="Port of the HTTP server (POST /solve, GET /stats)")
+    parser.add_argument("--engine", default="csp", choices=["csp", "bitboard", "placement", "sat"], help="Engine used when a request doesn't give one")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes (number of cores by default)")
+    parser.add_argument("--queue", type=int, default=64, help="Maximum number of requests waiting for a worker")
+    parser.add_argument("--deadline", type=float, default=None, help="Deadline in seconds used when a request doesn't give one")
+    parser.add_argument("--cache", default=None, help="SQLite solution cache shared by the workers")
+    args = parser.parse_args()
+    if args.port is None and args.unix is None and args.http_port is None:
+        parser.error("Give at least one of --port, --unix and --http-port")
+
+    builders = dict(
+        m_constraint_builder = MConstraint,
+        border_constraint_builder = BorderConstraint,
+        game_builder = Game,
+        csp_builder = CSP,
+        global_constraints = GlobalConstraints,
+        MRV = MRV,
+        LCV = LCV,
+        MaxDegree = MaxDegree,
+        AC3 = AC3,
+        ForwardCheck = ForwardCheck,
+        MAC = MAC,
+        BitboardCSP = BitboardCSP,
+        PlacementCSP = PlacementCSP,
+        SatCSP = SatCSP,
+    )
+    try:
+        asyncio.run(serve(args, builders))
+    except KeyboardInterrupt:
+        pass